@@ -0,0 +1,269 @@
+# Health counters for an acquisition run: port latency, sample timing, timeouts and bad reads
+import json
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+# Latency histogram bucket edges in seconds, log-spaced from 0.1 ms to 2 s
+LATENCY_EDGES = np.logspace(-4, math.log10(2.0), 29)
+
+
+class LatencyHistogram:
+    """Counts of round-trip times in LATENCY_EDGES buckets, plus their mean and maximum."""
+
+    def __init__(self, edges=LATENCY_EDGES):
+        self.edges = edges
+        # One extra bucket at each end for values outside the edges
+        self.counts = np.zeros(len(edges) + 1, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def add(self, seconds):
+        self.counts[np.searchsorted(self.edges, seconds, side="right")] += 1
+        self.count += 1
+        self.total += seconds
+        self.maximum = max(self.maximum, seconds)
+
+    def mean(self):
+        return self.total / self.count if self.count else float("nan")
+
+    def percentile(self, q):
+        """Upper edge of the bucket holding the q-th percentile (an upper bound on the true value)."""
+        if not self.count:
+            return float("nan")
+        bucket = int(np.searchsorted(np.cumsum(self.counts), self.count * q / 100))
+        return float(self.edges[bucket]) if bucket < len(self.edges) else self.maximum
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean_s": self.mean(),
+            "p50_s": self.percentile(50),
+            "p95_s": self.percentile(95),
+            "max_s": self.maximum,
+            "bucket_edges_s": self.edges.tolist(),
+            "bucket_counts": self.counts.tolist(),
+        }
+
+
+class RunningStats:
+    """Mean, standard deviation and extremes of a stream of values (Welford's method)."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.minimum = float("inf")
+        self.maximum = float("-inf")
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+
+    def add_many(self, values):
+        """Add an array of values at once (Chan et al.'s merge of two sets of moments)."""
+        values = np.asarray(values, dtype=float)
+        if not len(values):
+            return
+        count = self.count + len(values)
+        mean = float(values.mean())
+        delta = mean - self.mean
+        self._m2 += float(((values - mean) ** 2).sum()) + delta * delta * self.count * len(values) / count
+        self.mean += delta * len(values) / count
+        self.count = count
+        self.minimum = min(self.minimum, float(values.min()))
+        self.maximum = max(self.maximum, float(values.max()))
+
+    def std(self):
+        return math.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else float("nan")
+
+    def to_dict(self):
+        if not self.count:
+            return {"count": 0}
+        return {"count": self.count, "mean_s": self.mean, "std_s": self.std(),
+                "min_s": self.minimum, "max_s": self.maximum}
+
+
+class PortTelemetry:
+    """Counters for one sensor port."""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.replies = 0
+        self.timeouts = 0
+        self.invalid = 0
+        self.last_error = None
+
+    def to_dict(self):
+        return {
+            "replies": self.replies,
+            "timeouts": self.timeouts,
+            "invalid": self.invalid,
+            "last_error": self.last_error,
+            "latency": self.latency.to_dict(),
+        }
+
+
+class AcquisitionTelemetry:
+    """
+    Health of one acquisition run, shared by the reader threads and the engine.
+
+    Readers report each poll's round-trip time and whether it timed out; the engine reports
+    every recorded pair, from which the interval between samples (jitter) and the time between
+    the force and displacement requests are tracked. Sample timing restarts with set_rate(),
+    so after the trigger it describes the recording rate only.
+
+    readings_per_sec is the requested poll rate. When one port streams (`streamed`, e.g. "force"
+    in Streaming mode), samples follow that port's own output rate rather than the polls, so the
+    poll rate of the other port is measured and reported separately. The streamed readings of
+    a batch get evenly spread timestamps, so jitter is then taken between batch arrivals.
+    """
+
+    def __init__(self, readings_per_sec, ports=("force", "displacement"), streamed=None):
+        self._lock = threading.Lock()
+        self.ports = {port: PortTelemetry() for port in ports}
+        self.streamed = streamed
+        # Port whose replies are counted as polls
+        self.poll_port = next(port for port in ports if port != streamed)
+        self.set_rate(readings_per_sec)
+
+    def set_rate(self, readings_per_sec):
+        with self._lock:
+            self.requested_rate = readings_per_sec
+            self.intervals = RunningStats()
+            self.pair_skew = RunningStats()
+            self.first_sample_time = None
+            self.last_sample_time = None
+            self.samples = 0
+            self.first_poll_time = None
+            self.last_poll_time = None
+            self.polls = 0
+
+    def record_reply(self, port, latency, timed_out=False):
+        with self._lock:
+            if port == self.poll_port:
+                now = time.perf_counter()
+                if self.first_poll_time is None:
+                    self.first_poll_time = now
+                self.last_poll_time = now
+                self.polls += 1
+            telemetry = self.ports[port]
+            if timed_out:
+                telemetry.timeouts += 1
+            else:
+                telemetry.replies += 1
+                telemetry.latency.add(latency)
+
+    def record_invalid(self, port, count=1):
+        with self._lock:
+            self.ports[port].invalid += count
+
+    def record_error(self, port, message):
+        with self._lock:
+            self.ports[port].last_error = message
+
+    def record_sample(self, time_f, time_d):
+        with self._lock:
+            if self.last_sample_time is None:
+                self.first_sample_time = time_f
+            else:
+                self.intervals.add(time_f - self.last_sample_time)
+            self.last_sample_time = time_f
+            self.pair_skew.add(time_f - time_d)
+            self.samples += 1
+
+    def record_samples(self, times_f, time_d):
+        """record_sample for a block of force times, all paired with the displacement reading at time_d."""
+        times_f = np.asarray(times_f, dtype=float)
+        if not len(times_f):
+            return
+        with self._lock:
+            if self.last_sample_time is None:
+                self.first_sample_time = float(times_f[0])
+                if self.streamed is None:
+                    self.intervals.add_many(np.diff(times_f))
+            elif self.streamed is None:
+                self.intervals.add_many(np.diff(times_f, prepend=self.last_sample_time))
+            else:
+                # A streamed block ends at its batch's arrival; the times inside it are spread evenly
+                self.intervals.add(float(times_f[-1]) - self.last_sample_time)
+            self.last_sample_time = float(times_f[-1])
+            self.pair_skew.add_many(times_f - time_d)
+            self.samples += len(times_f)
+
+    def achieved_rate(self):
+        with self._lock:
+            if self.samples < 2 or self.last_sample_time <= self.first_sample_time:
+                return 0.0
+            return (self.samples - 1) / (self.last_sample_time - self.first_sample_time)
+
+    def achieved_poll_rate(self):
+        with self._lock:
+            if self.polls < 2 or self.last_poll_time <= self.first_poll_time:
+                return 0.0
+            return (self.polls - 1) / (self.last_poll_time - self.first_poll_time)
+
+    def status_line(self):
+        """Compact one-line summary for a status bar."""
+        rate = self.achieved_rate()
+        poll_rate = self.achieved_poll_rate()
+        with self._lock:
+            if self.streamed is None:
+                parts = [f"{rate:.1f}/{self.requested_rate:g} samples/s"]
+            else:
+                parts = [f"{self.streamed} stream {rate:.1f} samples/s",
+                         f"{self.poll_port} {poll_rate:.1f}/{self.requested_rate:g} polls/s"]
+            if self.intervals.count > 1:
+                jitter = "jitter" if self.streamed is None else "batch jitter"
+                parts.append(f"{jitter} {self.intervals.std() * 1000:.2f} ms")
+            for name, port in self.ports.items():
+                latency = port.latency
+                if latency.count:
+                    parts.append(f"{name} {latency.mean() * 1000:.1f} ms (p95 <{latency.percentile(95) * 1000:.1f})")
+            parts.append("timeouts " + "/".join(str(port.timeouts) for port in self.ports.values()))
+            parts.append("invalid " + "/".join(str(port.invalid) for port in self.ports.values()))
+        return " | ".join(parts)
+
+    def to_dict(self):
+        rate = self.achieved_rate()
+        poll_rate = self.achieved_poll_rate()
+        with self._lock:
+            return {
+                "streamed_port": self.streamed,
+                "requested_rate": self.requested_rate,
+                "achieved_poll_rate": poll_rate,
+                "achieved_rate": rate,
+                "samples": self.samples,
+                # Between samples, or between streamed batches
+                "sample_interval" if self.streamed is None else "batch_interval": self.intervals.to_dict(),
+                "force_displacement_skew": self.pair_skew.to_dict(),
+                "ports": {name: port.to_dict() for name, port in self.ports.items()},
+            }
+
+
+def run_metadata_path(data_path):
+    """Metadata file saved next to a run's data, e.g. run_20240101_120000.json beside the .csv."""
+    return os.path.splitext(data_path)[0] + ".json"
+
+
+def save_run_metadata(path, metadata):
+    """Write run settings and telemetry as JSON (NaN written as null)."""
+    def clean(value):
+        if isinstance(value, dict):
+            return {key: clean(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [clean(item) for item in value]
+        if isinstance(value, float) and not math.isfinite(value):
+            return None
+        return value
+
+    with open(path, "w") as f:
+        json.dump(clean(metadata), f, indent=2)
@@ -0,0 +1,152 @@
+# Measures acquisition throughput, timestamp skew and bad reads against simulated sensors
+# Example: python benchmarkAcquisition.py --rate 50 --latency 0.008 --duration 10
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from forceAcquisition import (DISPLACEMENT_POLL_COMMAND, FORCE_POLL_COMMAND, RawSample, SampleScheduler, merge_samples,
+                              merge_streamed_samples, start_polled_readers, start_streaming_readers, stop_readers)
+from lineParser import parse_displacement_buffer, parse_force_buffer
+from simulatedSensors import open_simulated_port
+
+MODES = ("sequential", "polled", "streaming")
+
+
+def run_sequential(force, displacement, readings_per_sec, duration):
+    """Reference: the single-threaded loop collect_data used before the per-sensor readers."""
+    delay = 1 / readings_per_sec
+    pairs = []
+    end_time = time.perf_counter() + duration
+    tick = 0
+    while time.perf_counter() < end_time:
+        loop_start_time = time.perf_counter()
+        displacement.write(DISPLACEMENT_POLL_COMMAND)
+        time_d = time.perf_counter()
+        force.write(FORCE_POLL_COMMAND)
+        time_f = time.perf_counter()
+        raw_force = force.readline().decode('utf-8', errors='replace').strip()
+        raw_displacement = displacement.readline().decode('utf-8', errors='replace').strip()
+        pairs.append((RawSample(tick, time_f, raw_force), RawSample(tick, time_d, raw_displacement)))
+        tick += 1
+
+        loop_duration = time.perf_counter() - loop_start_time
+        if loop_duration < delay:
+            time.sleep(delay - loop_duration)
+    return pairs, None
+
+
+def run_threaded(start_readers, merge, force, displacement, readings_per_sec, duration):
+    stop_event = threading.Event()
+    scheduler = SampleScheduler(readings_per_sec)
+    force_queue, displacement_queue, readers = start_readers(force, displacement, scheduler, stop_event)
+    pairs = []
+    end_time = time.perf_counter() + duration
+    for pair in merge(force_queue, displacement_queue, stop_event):
+        pairs.append(pair)
+        if time.perf_counter() >= end_time:
+            break
+    stop_readers(readers, stop_event)
+    return pairs, scheduler
+
+
+def count_invalid(samples, parse_buffer):
+    """Invalid readings among samples, parsed in one batch the way the streaming reader does."""
+    lines = [sample.raw for sample in samples]
+    # A timed-out read is an empty line, which the batch parser skips as blank
+    invalid = sum(1 for line in lines if not line)
+    parsed, _ = parse_buffer("".join(line + "\n" for line in lines if line).encode("utf-8"))
+    return invalid + parsed.errors
+
+
+def polled_results(pairs):
+    """Force times, displacement times, invalid readings and force ticks of (force, displacement) RawSample pairs."""
+    times_f = np.array([f.time for f, d in pairs])
+    times_d = np.array([d.time for f, d in pairs])
+    invalid = (count_invalid([f for f, d in pairs], parse_force_buffer)
+               + count_invalid([d for f, d in pairs], parse_displacement_buffer))
+    force_ticks = pairs[-1][0].tick + 1 if pairs else 0
+    return times_f, times_d, invalid, force_ticks
+
+
+def streamed_results(pairs):
+    """polled_results for the (SampleBatch, displacement RawSample) pairs of merge_streamed_samples."""
+    if not pairs:
+        return np.empty(0), np.empty(0), 0, 0
+    times_f = np.concatenate([batch.times for batch, d in pairs])
+    times_d = np.concatenate([np.full(len(batch.times), d.time) for batch, d in pairs])
+    # Each displacement reading is shared by several batches but counted once
+    displacements = list({d.tick: d for batch, d in pairs}.values())
+    invalid = (sum(int(np.isnan(batch.values).sum()) for batch, d in pairs)
+               + count_invalid(displacements, parse_displacement_buffer))
+    last_batch = pairs[-1][0]
+    return times_f, times_d, invalid, last_batch.tick + len(last_batch.values)
+
+
+def summarize(mode, results, scheduler, duration):
+    times_f, times_d, invalid, force_ticks = results
+    skew = np.abs(times_f - times_d) * 1000
+    return {
+        "mode": mode,
+        "samples": len(times_f),
+        "samples/s": len(times_f) / duration,
+        "skew mean (ms)": skew.mean() if len(skew) else float("nan"),
+        "skew p95 (ms)": np.percentile(skew, 95) if len(skew) else float("nan"),
+        "invalid": invalid,
+        "dropped": max(0, force_ticks - len(times_f)),
+        "overruns": scheduler.overruns if scheduler is not None else "-",
+    }
+
+
+def run_benchmark(mode, args):
+    query = f"latency={args.latency}&jitter={args.jitter}&error_rate={args.error_rate}"
+    force_query = query + (f"&stream_rate={args.stream_rate}" if mode == "streaming" else "")
+    force = open_simulated_port(f"sim:force?{force_query}", timeout=args.timeout)
+    displacement = open_simulated_port(f"sim:displacement?{query}", timeout=args.timeout)
+    try:
+        if mode == "sequential":
+            pairs, scheduler = run_sequential(force, displacement, args.rate, args.duration)
+        elif mode == "polled":
+            pairs, scheduler = run_threaded(start_polled_readers, merge_samples,
+                                            force, displacement, args.rate, args.duration)
+        else:
+            pairs, scheduler = run_threaded(start_streaming_readers, merge_streamed_samples,
+                                            force, displacement, args.rate, args.duration)
+    finally:
+        force.close()
+        displacement.close()
+    results = streamed_results(pairs) if mode == "streaming" else polled_results(pairs)
+    return summarize(mode, results, scheduler, args.duration)
+
+
+def print_table(results):
+    headers = list(results[0])
+    widths = [max(len(h), 12) for h in headers]
+    print("  ".join(h.rjust(w) for h, w in zip(headers, widths)))
+    for result in results:
+        cells = [f"{v:.2f}" if isinstance(v, float) else str(v) for v in result.values()]
+        print("  ".join(c.rjust(w) for c, w in zip(cells, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the acquisition modes against simulated sensors.")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--rate", type=float, default=1000, help="requested readings per second")
+    parser.add_argument("--duration", type=float, default=5, help="seconds to run each mode")
+    parser.add_argument("--latency", type=float, default=0.01, help="mean reply latency of each sensor (s)")
+    parser.add_argument("--jitter", type=float, default=0.002, help="standard deviation of the reply latency (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of garbled replies")
+    parser.add_argument("--stream-rate", type=float, default=350, help="gauge output rate in streaming mode (lines/s)")
+    parser.add_argument("--timeout", type=float, default=0.2, help="serial read timeout (s)")
+    args = parser.parse_args()
+
+    results = []
+    for mode in args.modes:
+        print(f"Running {mode} for {args.duration} s...")
+        results.append(run_benchmark(mode, args))
+    print_table(results)
+
+
+if __name__ == "__main__":
+    main()
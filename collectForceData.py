@@ -10,6 +10,7 @@ from collections import deque
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import pandas as pd
 from tkinter import filedialog, messagebox
+from forceAcquisition import open_connection
 
 # Initialize the main window
 ctk.set_appearance_mode("System")
@@ -108,7 +109,7 @@ class ForceDataApp(ctk.CTk):
     def collect_data(self):
         # Open serial connection
         try:
-            self.serial_connection = serial.Serial(self.port_var.get(), self.baud_rate, timeout=1)
+            self.serial_connection = open_connection(self.port_var.get(), self.baud_rate, timeout=1)
             print('port opened....')
         except serial.SerialException as e:
             print(f"Error opening serial port: {e}")
@@ -1,14 +1,19 @@
 # This program reads force, displacement, and calculates velocity, then plots in real-time
 import customtkinter as ctk
+import os
+import shutil
 import serial
 import time
 import threading
 import matplotlib.pyplot as plt
-import matplotlib.animation as animation
 from collections import deque
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import pandas as pd
 from tkinter import filedialog, messagebox
+from forceAcquisition import ACQUISITION_MODES, BASELINE_MODES, AcquisitionEngine, open_connection
+from acquisitionTelemetry import run_metadata_path, save_run_metadata
+from sampleStore import SampleStore, SampleWriter
+from livePlot import LivePlotRenderer
+from processRun import write_run_workbook
 
 # Initialize the main window
 ctk.set_appearance_mode("System")
@@ -32,14 +37,11 @@ class ForceDisplacementApp(ctk.CTk):
         self.serial_force_connection = None
         self.serial_displacement_connection = None
         self.collecting_data = False  # Flag to control data collection
+        self.engine = None  # Runs the sensor readers and the trigger
+        self.sample_writer = None  # Logs the current run to disk while it is recorded
 
-        # Data storage
-        self.time_data_f = []
-        self.time_data_d = []
-        self.force_data = []
-        self.displacement_data = []
-        self.velocity_data = []
-        self.delta_time_data = []
+        # Data storage: one row per paired sample, columns as in sampleStore.COLUMNS
+        self.samples = SampleStore()
 
         # UI elements for force port
         self.force_port_label = ctk.CTkLabel(self, text="Force Sensor COM Port:")
@@ -70,21 +72,58 @@ class ForceDisplacementApp(ctk.CTk):
         self.rps_entry = ctk.CTkEntry(self, textvariable=self.readings_per_sec_var)
         self.rps_entry.grid(row=3, column=2, padx=20, pady=10, sticky="NSW")
 
+        # Polled asks the gauge for every reading; Streaming reads the gauge's continuous output
+        # and polls only the displacement sensor at the readings-per-second rate
+        self.acquisition_mode_var = ctk.StringVar(value=ACQUISITION_MODES[0])
+
+        self.mode_label = ctk.CTkLabel(self, text="Force Acquisition Mode:")
+        self.mode_label.grid(row=4, column=0, padx=20, pady=10, sticky="NSE")
+
+        self.mode_menu = ctk.CTkOptionMenu(self, values=list(ACQUISITION_MODES), variable=self.acquisition_mode_var)
+        self.mode_menu.grid(row=4, column=2, padx=20, pady=10, sticky="NSW")
+
+        # Samples from this many seconds before the start force are kept with negative times
+        self.pretrigger_seconds_var = ctk.DoubleVar(value=1.0)
+        self.baseline_var = ctk.StringVar(value=BASELINE_MODES[0])
+
+        self.pretrigger_label = ctk.CTkLabel(self, text="Pre-trigger Length (s):")
+        self.pretrigger_label.grid(row=5, column=0, padx=20, pady=10, sticky="NSE")
+
+        self.pretrigger_entry = ctk.CTkEntry(self, textvariable=self.pretrigger_seconds_var)
+        self.pretrigger_entry.grid(row=5, column=2, padx=20, pady=10, sticky="NSW")
+
+        self.baseline_label = ctk.CTkLabel(self, text="Zero Displacement At:")
+        self.baseline_label.grid(row=6, column=0, padx=20, pady=10, sticky="NSE")
+
+        self.baseline_menu = ctk.CTkOptionMenu(self, values=list(BASELINE_MODES), variable=self.baseline_var)
+        self.baseline_menu.grid(row=6, column=2, padx=20, pady=10, sticky="NSW")
+
+        # Every run is logged to a CSV file in this folder while it is recorded
+        self.log_dir_var = ctk.StringVar(value=os.path.join(os.path.expanduser("~"), "ForceDisplacementRuns"))
+
+        self.log_dir_label = ctk.CTkLabel(self, text="Run Log Folder:")
+        self.log_dir_label.grid(row=7, column=0, padx=20, pady=10, sticky="NSE")
+
+        self.log_dir_entry = ctk.CTkEntry(self, textvariable=self.log_dir_var)
+        self.log_dir_entry.grid(row=7, column=2, padx=20, pady=10, sticky="NSW")
+
         self.start_button = ctk.CTkButton(self, text="Start Collection", command=self.start_collection)
-        self.start_button.grid(row=4, column=0, padx=20, pady=10, sticky="NSE")
+        self.start_button.grid(row=8, column=0, padx=20, pady=10, sticky="NSE")
 
         self.stop_button = ctk.CTkButton(self, text="Stop Collection", command=self.stop_collection)
-        self.stop_button.grid(row=4, column=2, padx=20, pady=10, sticky="NSW")
+        self.stop_button.grid(row=8, column=2, padx=20, pady=10, sticky="NSW")
 
         self.save_button = ctk.CTkButton(self, text="Save Data", command=self.save_data)
-        self.save_button.grid(row=5, column=0,columnspan=3, padx=20, pady=10, sticky="NSEW")
+        self.save_button.grid(row=9, column=0,columnspan=3, padx=20, pady=10, sticky="NSEW")
+
+        # Shows the sampling rate actually achieved during a run
+        self.status_label = ctk.CTkLabel(self, text="")
+        self.status_label.grid(row=10, column=0, columnspan=3, padx=20, pady=0, sticky="NSEW")
 
         # Plot setup: Force vs Displacement
         self.fig, (self.ax_force_disp, self.ax_velocity_time) = plt.subplots(2, 1, gridspec_kw={'height_ratios': [3, 1], 'hspace': 0.5})
 
         # Plot for force vs displacement
-        self.displacement_data = [] #deque(maxlen=100)
-        self.force_data = [] #deque(maxlen=100)
         self.line_force_disp, = self.ax_force_disp.plot([], [], 'r-')
         self.ax_force_disp.set_ylim(0, 5)
         self.ax_force_disp.set_xlim(0, 10)
@@ -92,9 +131,6 @@ class ForceDisplacementApp(ctk.CTk):
         self.ax_force_disp.set_xlabel('Displacement (mm)')
 
         # Plot for velocity vs time
-        self.velocity_data = []
-        self.time_data_f = [] 
-        self.time_data_d = [] 
         self.line_velocity_time, = self.ax_velocity_time.plot([], [], 'b-')
         self.ax_velocity_time.set_ylim(0, 1)
         self.ax_velocity_time.set_xlim(0, 30)
@@ -102,14 +138,17 @@ class ForceDisplacementApp(ctk.CTk):
         self.ax_velocity_time.set_xlabel('Time (s)')
 
         self.canvas = FigureCanvasTkAgg(self.fig, master=self)
-        self.canvas.get_tk_widget().grid(row=6, column=0, columnspan=3, pady=10, padx=10, sticky="nsew")
+        self.canvas.get_tk_widget().grid(row=11, column=0, columnspan=3, pady=10, padx=10, sticky="nsew")
 
-        self.anim = animation.FuncAnimation(self.fig, self.update_plot, interval=100, save_count=30000)
+        # Redraw the lines from the Tk thread every 100 ms using blitting
+        self.plot_renderer = LivePlotRenderer(self.canvas, self.ax_force_disp, self.ax_velocity_time,
+                                              self.line_force_disp, self.line_velocity_time)
+        self.after(100, self.update_plot)
 
         # Layout management
         self.grid_columnconfigure(0, weight=1)
         self.grid_columnconfigure(2, weight=1)
-        self.grid_rowconfigure(6, weight=1)
+        self.grid_rowconfigure(11, weight=1)
 
     def start_collection(self):
         # Clear previously collected data, table, and graphs
@@ -122,28 +161,21 @@ class ForceDisplacementApp(ctk.CTk):
 
     def clear_data(self):
         """Clear all collected data, table, and graphs."""
-        # Clear data lists
-        self.time_data_f.clear()
-        self.time_data_d.clear()
-        self.force_data.clear()
-        self.displacement_data.clear()
-        self.velocity_data.clear()
-        self.delta_time_data.clear()
+        # Clear stored samples
+        self.samples.clear()
 
         # Reset plot bounds
-        self.ax_velocity_time.set_ylim(0, 1)
-        self.ax_velocity_time.set_xlim(0, 30)
-        self.ax_force_disp.set_ylim(0, 2)
-        self.ax_force_disp.set_xlim(0, 1)
+        self.plot_renderer.reset()
 
     def stop_collection(self):
         # Stop the data collection loop
         self.collecting_data = False
-        self.start_button.configure(state=ctk.NORMAL)
+        if self.engine is not None:
+            self.engine.stop()
         self.stop_button.configure(state=ctk.DISABLED)
 
-        # Close all open serial ports
-        self.close_serial_ports()
+        # The acquisition thread closes the serial ports once its readers have stopped, and only
+        # then re-enables Start, so a new run never reopens ports or clears samples still in use
 
     def close_serial_ports(self):
         """Safely close all serial connections."""
@@ -158,8 +190,8 @@ class ForceDisplacementApp(ctk.CTk):
     def collect_data(self):
         # Open serial connections for force and displacement
         try:
-            self.serial_force_connection = serial.Serial(self.force_port_var.get(), self.baud_rate, timeout=0.2)
-            self.serial_displacement_connection = serial.Serial(self.displacement_port_var.get(), self.baud_rate, timeout=0.2)
+            self.serial_force_connection = open_connection(self.force_port_var.get(), self.baud_rate, timeout=0.2)
+            self.serial_displacement_connection = open_connection(self.displacement_port_var.get(), self.baud_rate, timeout=0.2)
             print('Serial connections opened....')
         except serial.SerialException as e:
             print(f"Error opening serial port: {e}")
@@ -168,121 +200,98 @@ class ForceDisplacementApp(ctk.CTk):
             return
 
         readings_per_sec = self.readings_per_sec_var.get()
-        delay = 1 / readings_per_sec
         start_force = self.start_force_var.get()
 
-        previous_displacement = 0
-        previous_time_d = 0
-
-
-        while True:
-            self.serial_force_connection.write(bytes.fromhex("3f0d"))
-            raw_force_data = self.serial_force_connection.readline().decode('utf-8').strip()
-
-            self.serial_displacement_connection.write(bytes.fromhex("310d"))  # Hex command for displacement
-            raw_displacement_data = self.serial_displacement_connection.readline().decode('utf-8').strip()
-
-            try:
-                force_value = float(raw_force_data.replace(" N", ""))
-                displacement_value = self.parse_displacement(raw_displacement_data)
-            except ValueError:
-                print('value error')
-                continue
-
-            if force_value >= start_force:
-                initial_displacement = displacement_value  # Set displacement starting point to zero
-                self.last_table_update_index = 0  # Track last index of data added to the table
-                start_time = time.time()  
-                while self.collecting_data:
-                    loop_start_time_f = time.time()
-                    self.serial_displacement_connection.write(bytes.fromhex("310d"))  # Hex command for displacement
-                    loop_start_time_d = time.time()
-                    current_time_d = loop_start_time_d - start_time
-                    self.serial_force_connection.write(bytes.fromhex("3f0d"))
-                    current_time_f = time.time() - start_time
-
-                    raw_force_data = self.serial_force_connection.readline().decode('utf-8').strip()
-                    raw_displacement_data = self.serial_displacement_connection.readline().decode('utf-8').strip()
-                    
-                    delta_time_rec = current_time_f-current_time_d
-
-                    try:
-                        force_value = float(raw_force_data.replace(" N", ""))
-                        displacement_value = self.parse_displacement(raw_displacement_data)
-                    except ValueError:
-                        break
-
-                    adjusted_displacement = abs(displacement_value - initial_displacement)  # Start at 0
-                   
-                    # Calculate velocity
-                    if previous_time_d > 0:
-                        delta_time = current_time_d - previous_time_d
-                        delta_displacement = adjusted_displacement - previous_displacement
-                        velocity_value = delta_displacement / delta_time if delta_time != 0 else 0
-                    else:
-                        velocity_value = 0
-
-                    previous_displacement = adjusted_displacement
-                    previous_time_d = current_time_d
-                    
-                    # Append data to storage lists
-                    self.time_data_f.append(current_time_f)
-                    self.force_data.append(force_value)
-                    self.time_data_d.append(current_time_d)
-                    self.displacement_data.append(adjusted_displacement)
-                    self.velocity_data.append(velocity_value)
-                    self.delta_time_data.append(delta_time_rec)
-                    
-                    self.update_graph()
-
-                    loop_end_time = time.time()
-                    loop_duration = loop_end_time - loop_start_time_f
-                    
-                    if loop_duration < delay:
-                        time.sleep(delay - loop_duration)
-
-
-    def update_graph(self):
-        # Update the force vs displacement graph
-        self.ax_force_disp.set_xlim(0, max(1, self.displacement_data[-1]+1))
-        self.ax_force_disp.set_ylim(0, max(2, self.force_data[-1]+2))
-
-        # Update the velocity vs time graph
-        self.ax_velocity_time.set_ylim(0, max(.25, max(self.velocity_data)))
-        self.ax_velocity_time.set_xlim(0, max(10, self.time_data_d[-1]+2))
-
-    def update_plot(self, frame):
-        self.line_force_disp.set_data(self.displacement_data, self.force_data)
-        self.line_velocity_time.set_data(self.time_data_d, self.velocity_data)
-        return self.line_force_disp, self.line_velocity_time
-    
-    def parse_displacement(self, raw_data):
-        # Example displacement format: "01A+00024.35"
+        # Log samples to disk from a separate thread so the acquisition loop never waits on file I/O
+        log_path = os.path.join(self.log_dir_var.get(), f"run_{time.strftime('%Y%m%d_%H%M%S')}.csv")
         try:
-            return float(raw_data[3:])  # Extract the number after "01A+"
-        except ValueError:
-            return 0
+            os.makedirs(self.log_dir_var.get(), exist_ok=True)
+        except OSError as e:
+            print(f"Error creating run log folder: {e}")
+            messagebox.showerror("Log Error", f"Error creating run log folder: {e}")
+            self.close_serial_ports()
+            self.start_button.configure(state=ctk.NORMAL)
+            return
+        self.sample_writer = SampleWriter(self.samples, log_path)
+        self.sample_writer.start()
+        print(f"Logging run to {log_path}")
+
+        self.engine = AcquisitionEngine(self.serial_force_connection, self.serial_displacement_connection, self.samples,
+                                        readings_per_sec, start_force, self.acquisition_mode_var.get(),
+                                        pretrigger_seconds=self.pretrigger_seconds_var.get(),
+                                        baseline=self.baseline_var.get())
+        if not self.collecting_data:
+            # Stop was pressed while the ports were opening
+            self.engine.stop()
+        try:
+            self.engine.run()
+        finally:
+            self.close_serial_ports()
+            self.sample_writer.finish()
+            # Settings and link health go next to the run log for later diagnosis
+            metadata = self.engine.run_metadata()
+            metadata.update(force_port=self.force_port_var.get(), displacement_port=self.displacement_port_var.get(),
+                            baud_rate=self.baud_rate, data_file=os.path.basename(log_path))
+            try:
+                save_run_metadata(run_metadata_path(log_path), metadata)
+            except OSError as e:
+                print(f"Error saving run metadata: {e}")
+            self.after(0, lambda: self.start_button.configure(state=ctk.NORMAL))
+
+    def update_plot(self):
+        self.plot_renderer.render(self.samples.snapshot())
+        self.update_status()
+        self.after(100, self.update_plot)
+
+    def update_status(self):
+        if self.engine is None:
+            return
+        if not self.engine.triggered and len(self.samples) == 0:
+            self.status_label.configure(text=f"Waiting for {self.engine.start_force} N...")
+            return
+        self.status_label.configure(
+            text=f"{self.engine.telemetry.status_line()} | overruns {self.engine.scheduler.overruns}")
 
     def save_data(self):
-        if not self.time_data_f or not self.force_data:
+        snapshot = self.samples.snapshot()
+        if len(snapshot) == 0:
             messagebox.showwarning("No Data", "No data available to save!")
             return
 
-        file_path = filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=[("Excel files", "*.xlsx")])
+        file_path = filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=[("Excel files", "*.xlsx"), ("CSV files", "*.csv")])
         if not file_path:
             return
 
-        data_dict = {
-            "Force Time (s)": self.time_data_f,
-            "Force (N)": self.force_data,
-            "Displacement Time (s)": self.time_data_d,
-            "Displacement (mm)": self.displacement_data,
-            "Velocity (mm/s)": self.velocity_data,
-            "Delta Time (s)": self.delta_time_data
-        }
-        df = pd.DataFrame(data_dict)
-        df.to_excel(file_path, index=False)
-        messagebox.showinfo("Data Saved", f"Data successfully saved to {file_path}")
+        # Keep the run's metadata with the saved copy
+        writer = self.sample_writer
+        if writer is not None and not writer.is_alive() and os.path.exists(run_metadata_path(writer.file_path)):
+            shutil.copyfile(run_metadata_path(writer.file_path), run_metadata_path(file_path))
+
+        # A finished run is already on disk as CSV, so saving as CSV is just a copy
+        if file_path.lower().endswith(".csv") and writer is not None and not writer.is_alive():
+            shutil.copyfile(writer.file_path, file_path)
+            messagebox.showinfo("Data Saved", f"Data successfully saved to {file_path}")
+            return
+
+        # Excel export is slow on long runs, so it runs off the Tk thread
+        self.save_button.configure(state=ctk.DISABLED)
+        threading.Thread(target=self.export_data, args=(snapshot, file_path), daemon=True).start()
+
+    def export_data(self, snapshot, file_path):
+        try:
+            df = snapshot.to_dataframe()
+            if file_path.lower().endswith(".csv"):
+                df.to_csv(file_path, index=False)
+            else:
+                # Uniform timebase with smoothed velocity and acceleration, plus the raw samples
+                write_run_workbook(df, file_path)
+        except Exception as e:
+            message = f"Failed to save data: {e}"
+            self.after(0, lambda: messagebox.showerror("Save Error", message))
+        else:
+            self.after(0, lambda: messagebox.showinfo("Data Saved", f"Data successfully saved to {file_path}"))
+        finally:
+            self.after(0, lambda: self.save_button.configure(state=ctk.NORMAL))
 
     # Function to ensure all processes are killed on exit
     def on_closing(self):
@@ -1,82 +1,472 @@
+import argparse
+import json
 import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
 import logging
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def process_excel_files(folder_path, output_path):
-    # Dictionary to hold data for different sheets
+DISPLACEMENT_COLUMN = 'Displacement (mm)'
+FORCE_COLUMN = 'Force (N)'
+ALIGN_METHODS = ("bin", "interp")
+
+# Percentiles across runs written to each envelope sheet
+ENVELOPE_PERCENTILES = (5, 25, 50, 75, 95)
+# Suffixes of the summary sheets written next to each combined sheet
+SUMMARY_SUFFIXES = ('_envelope', '_runs')
+
+# Parsed columns of each test file are cached here, inside the data folder
+CACHE_DIR_NAME = '.combine_cache'
+
+# Files folded into each sheet of an output, saved next to it for incremental updates
+# as <output name>.<format>.manifest.json, so outputs sharing a name keep separate manifests
+MANIFEST_SUFFIX = '.manifest.json'
+
+# "xlsx" keeps every sheet in memory (openpyxl) but can replace single sheets in place;
+# "xlsx-stream" writes rows straight to disk; "csv" and "parquet" write one file per sheet
+# into a folder; "hdf5" stores one table per sheet in one file. Parquet needs pyarrow or
+# fastparquet and HDF5 needs PyTables.
+OUTPUT_FORMATS = ("xlsx", "xlsx-stream", "csv", "parquet", "hdf5")
+DEFAULT_OUTPUT_NAMES = {"xlsx": "combined_data.xlsx", "xlsx-stream": "combined_data.xlsx", "csv": "combined_data",
+                        "parquet": "combined_data", "hdf5": "combined_data.h5"}
+# Formats that can update some sheets and leave the others alone
+PARTIAL_UPDATE_FORMATS = ("xlsx", "csv", "parquet", "hdf5")
+# Formats that write the same file, so rebuilding it in one invalidates the other's manifest
+SAME_FILE_FORMATS = {"xlsx": ("xlsx", "xlsx-stream"), "xlsx-stream": ("xlsx", "xlsx-stream")}
+
+
+def sheet_name_for(file_name):
+    """Sheet a test file belongs to, from its name (format X_X_X_X.xlsx), or None if the name does not fit."""
+    file_parts = file_name.split('_')
+    if len(file_parts) < 4:
+        return None
+    num_needles = file_parts[0]
+    test_type = file_parts[3]  # "c" or "i"
+    return f"{num_needles}_needle_{test_type}"
+
+
+def read_run(file_path):
+    """Read the displacement and force columns of one test file as float arrays."""
+    df = pd.read_excel(file_path)
+    if DISPLACEMENT_COLUMN not in df.columns:
+        raise KeyError(f"'{DISPLACEMENT_COLUMN}' column not found")
+    return df[DISPLACEMENT_COLUMN].to_numpy(dtype=float), df[FORCE_COLUMN].to_numpy(dtype=float)
+
+
+def _cache_path(cache_dir, file_name):
+    return os.path.join(cache_dir, file_name + '.npz')
+
+
+def load_cached_run(file_path, cache_dir):
+    """Columns of a test file from the cache, or None if it is missing or the file has changed since."""
+    stat = os.stat(file_path)
+    try:
+        with np.load(_cache_path(cache_dir, os.path.basename(file_path))) as cached:
+            if (str(cached['path']) == os.path.abspath(file_path) and int(cached['mtime_ns']) == stat.st_mtime_ns
+                    and int(cached['size']) == stat.st_size):
+                return cached['displacement'], cached['force']
+    except (OSError, KeyError, ValueError):
+        pass
+    return None
+
+
+def cache_run(file_path, cache_dir, displacement, force):
+    """Store the parsed columns of a test file, keyed by its path, modification time and size."""
+    stat = os.stat(file_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_path = _cache_path(cache_dir, os.path.basename(file_path))
+    # Write to a temporary name first so an interrupted run never leaves a truncated cache file
+    temporary_path = cache_path + '.tmp.npz'
+    np.savez(temporary_path, path=os.path.abspath(file_path), mtime_ns=stat.st_mtime_ns, size=stat.st_size,
+             displacement=displacement, force=force)
+    os.replace(temporary_path, cache_path)
+
+
+def file_signature(file_path):
+    stat = os.stat(file_path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def manifest_path(output_path, output_format):
+    return f"{os.path.splitext(output_path)[0]}.{output_format}{MANIFEST_SUFFIX}"
+
+
+def load_manifest(output_path, settings):
+    """
+    Sheets of an existing output and the files in each, as {sheet: {file name: signature}}.
+
+    Returns None when there is no usable manifest: the output or manifest is missing, or the
+    output was built with different settings, so it has to be rebuilt in full.
+    """
+    if not os.path.exists(output_path):
+        return None
+    try:
+        with open(manifest_path(output_path, settings['format'])) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('settings') != settings:
+        return None
+    return manifest.get('sheets')
+
+
+def remove_manifests(output_path, output_format):
+    """Delete the manifests of every format that writes the same file as output_format at output_path."""
+    for other_format in SAME_FILE_FORMATS.get(output_format, (output_format,)):
+        path = manifest_path(output_path, other_format)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def save_manifest(output_path, settings, sheets):
+    with open(manifest_path(output_path, settings['format']), 'w') as f:
+        json.dump({'settings': settings, 'sheets': sheets}, f, indent=2)
+
+
+def _write_xlsx(output_path, data_dict, removed, update):
+    if update:
+        writer = pd.ExcelWriter(output_path, engine='openpyxl', mode='a', if_sheet_exists='replace')
+    else:
+        writer = pd.ExcelWriter(output_path, engine='openpyxl')
+    with writer:
+        for sheet_name, data in data_dict.items():
+            data.to_excel(writer, sheet_name=sheet_name, index=False)
+        for sheet_name in removed:
+            # A workbook needs at least one sheet
+            if sheet_name in writer.book.sheetnames and len(writer.book.sheetnames) > 1:
+                writer.book.remove(writer.book[sheet_name])
+
+
+def _write_xlsx_stream(output_path, data_dict, chunk_rows=1000):
+    """Write rows straight to disk with a write-only openpyxl workbook, a block of rows at a time."""
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    for sheet_name, data in data_dict.items():
+        worksheet = workbook.create_sheet(sheet_name)
+        worksheet.append(list(data.columns))
+        for start in range(0, len(data), chunk_rows):
+            block = data.iloc[start:start + chunk_rows]
+            # Empty cells rather than NaN, as to_excel writes them
+            values = block.to_numpy(dtype=object, copy=True)
+            values[block.isna().to_numpy()] = None
+            for row in values.tolist():
+                worksheet.append(row)
+    workbook.save(output_path)
+
+
+def _write_sheet_files(output_path, data_dict, removed, extension, update):
+    """One file per sheet in the output folder; a full rebuild first clears the folder's earlier sheet files."""
+    os.makedirs(output_path, exist_ok=True)
+    if not update:
+        for file_name in os.listdir(output_path):
+            if file_name.endswith(f".{extension}"):
+                os.remove(os.path.join(output_path, file_name))
+    for sheet_name, data in data_dict.items():
+        sheet_path = os.path.join(output_path, f"{sheet_name}.{extension}")
+        if extension == "csv":
+            data.to_csv(sheet_path, index=False)
+        else:
+            data.to_parquet(sheet_path, index=False)
+    for sheet_name in removed:
+        sheet_path = os.path.join(output_path, f"{sheet_name}.{extension}")
+        if os.path.exists(sheet_path):
+            os.remove(sheet_path)
+
+
+def _write_hdf5(output_path, data_dict, removed, update):
+    with pd.HDFStore(output_path, mode='a' if update else 'w') as store:
+        for sheet_name, data in data_dict.items():
+            store.put(sheet_name, data)
+        for sheet_name in removed:
+            if sheet_name in store:
+                store.remove(sheet_name)
+
+
+def write_output(output_path, output_format, data_dict, removed=(), update=False):
+    """
+    Write the combined sheets in one of OUTPUT_FORMATS.
+
+    With update=True the sheets in data_dict replace their earlier versions, the sheets in
+    removed are deleted and every other sheet of the existing output is kept.
+    """
+    if output_format == "xlsx-stream":
+        _write_xlsx_stream(output_path, data_dict)
+    elif output_format in ("csv", "parquet"):
+        _write_sheet_files(output_path, data_dict, removed, output_format, update)
+    elif output_format == "hdf5":
+        _write_hdf5(output_path, data_dict, removed, update)
+    else:
+        _write_xlsx(output_path, data_dict, removed, update)
+
+
+def _read_and_cache(file_path, cache_dir):
+    """Worker task: parse one file and cache it. Errors are returned, to be logged by the main process."""
+    try:
+        displacement, force = read_run(file_path)
+    except KeyError as e:
+        return None, ('warning', f"{e.args[0]}. Skipping file.")
+    except Exception as e:
+        return None, ('error', f"Failed to read file: {str(e)}")
+    if cache_dir is not None:
+        try:
+            cache_run(file_path, cache_dir, displacement, force)
+        except OSError as e:
+            return (displacement, force), ('warning', f"Could not cache: {str(e)}")
+    return (displacement, force), None
+
+
+def load_runs(folder_path, file_names, use_cache=True, workers=None):
+    """
+    Read the displacement and force columns of several test files.
+
+    Files whose cache entry is still valid load from it; the rest are parsed in a process pool
+    of `workers` processes (default: one per CPU) and cached. Returns {file name: (displacement,
+    force)} for the files that could be read.
+    """
+    cache_dir = os.path.join(folder_path, CACHE_DIR_NAME) if use_cache else None
+    runs = {}
+    to_read = []
+    for file_name in file_names:
+        cached = load_cached_run(os.path.join(folder_path, file_name), cache_dir) if use_cache else None
+        if cached is None:
+            to_read.append(file_name)
+        else:
+            runs[file_name] = cached
+    logging.info(f'{len(runs)} files from cache, {len(to_read)} to read')
+
+    paths = [os.path.join(folder_path, file_name) for file_name in to_read]
+    if workers == 1 or len(to_read) < 2:
+        results = [_read_and_cache(path, cache_dir) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_read_and_cache, paths, [cache_dir] * len(paths)))
+
+    for file_name, (run, problem) in zip(to_read, results):
+        if problem is not None:
+            level, message = problem
+            getattr(logging, level)(f"{file_name}: {message}")
+        if run is not None:
+            runs[file_name] = run
+    return runs
+
+
+def _mean_by_key(keys, force):
+    """Sorted unique keys and the mean force of the readings sharing each key."""
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    return unique_keys, np.bincount(inverse, weights=force) / np.bincount(inverse)
+
+
+def _valid(displacement, force):
+    keep = ~(np.isnan(displacement) | np.isnan(force))
+    return displacement[keep], force[keep]
+
+
+def _bin_run(displacement, force, resolution):
+    """Grid indices of one run's readings, with several readings at one grid point averaged."""
+    displacement, force = _valid(displacement, force)
+    return _mean_by_key(np.round(displacement / resolution).astype(np.int64), force)
+
+
+def _interp_run(displacement, force, resolution):
+    """Grid indices spanned by one run, with force interpolated at each grid point."""
+    positions, mean_force = _mean_by_key(*_valid(displacement, force))
+    if len(positions) == 0:
+        return positions.astype(np.int64), mean_force
+    grid = np.arange(np.ceil(positions[0] / resolution), np.floor(positions[-1] / resolution) + 1).astype(np.int64)
+    return grid, np.interp(grid * resolution, positions, mean_force)
+
+
+def align_runs(runs, resolution=0.01, method=ALIGN_METHODS[0]):
+    """
+    Put several runs on one shared displacement grid.
+
+    runs is a list of (column name, displacement, force). With method "bin" each reading goes to
+    the nearest grid point and readings sharing a point are averaged, so repeated displacement
+    values give one row instead of multiplying rows; with "interp" force is interpolated at the
+    grid points each run spans. Returns a DataFrame with the displacement column followed by one
+    force column per run, NaN where a run has no reading.
+    """
+    align_run = _interp_run if method == "interp" else _bin_run
+    aligned = [align_run(displacement, force, resolution) for _, displacement, force in runs]
+    if not aligned:
+        return pd.DataFrame(columns=[DISPLACEMENT_COLUMN])
+
+    # Scatter every run into one (grid points, runs) table in a single step
+    run_bins = [bins for bins, _ in aligned]
+    grid = np.unique(np.concatenate(run_bins))
+    rows = np.searchsorted(grid, np.concatenate(run_bins))
+    columns = np.repeat(np.arange(len(aligned)), [len(bins) for bins in run_bins])
+    table = np.full((len(grid), len(aligned)), np.nan)
+    table[rows, columns] = np.concatenate([force for _, force in aligned])
+
+    data = {DISPLACEMENT_COLUMN: np.round(grid * resolution, 10)}
+    data.update(zip((name for name, _, _ in runs), table.T))
+    return pd.DataFrame(data)
+
+
+def summarize_sheet(data):
+    """
+    Statistics of one combined sheet, computed across all its runs at once.
+
+    Returns (envelope, runs). envelope has, per displacement grid point, the number of runs
+    with a reading there and the mean, standard deviation and ENVELOPE_PERCENTILES of their
+    force. runs has one row per run with its peak force, the displacement at the peak and the
+    work done, the area under its force-displacement curve (N*mm = mJ), bridging grid points
+    where it has no reading.
+    """
+    displacement = data[DISPLACEMENT_COLUMN].to_numpy()
+    force_columns = [column for column in data.columns if column != DISPLACEMENT_COLUMN]
+    force = data[force_columns].to_numpy(dtype=float)  # (grid points, runs)
+    has_reading = ~np.isnan(force)
+    count = has_reading.sum(axis=1)
+
+    envelope = {DISPLACEMENT_COLUMN: displacement, 'Runs': count}
+    with np.errstate(invalid='ignore', divide='ignore'):
+        envelope['Mean Force (N)'] = np.nansum(force, axis=1) / count
+        squares = np.nansum((force - envelope['Mean Force (N)'][:, None]) ** 2, axis=1)
+        envelope['Std Force (N)'] = np.sqrt(squares / (count - 1))
+    envelope['Std Force (N)'][count < 2] = np.nan
+    # Every grid point has at least one reading, so no row is all NaN
+    percentiles = np.nanpercentile(force, ENVELOPE_PERCENTILES, axis=1)
+    for percentile, values in zip(ENVELOPE_PERCENTILES, percentiles):
+        envelope[f'P{percentile} Force (N)'] = values
+
+    # Trapezoids from each reading back to the same run's previous reading
+    row_index = np.where(has_reading, np.arange(len(displacement))[:, None], -1)
+    previous = np.maximum.accumulate(row_index, axis=0)
+    previous = np.vstack([np.full((1, force.shape[1]), -1), previous[:-1]])
+    segment = has_reading & (previous >= 0)
+    previous = np.maximum(previous, 0)
+    run_index = np.arange(force.shape[1])
+    areas = 0.5 * (force + force[previous, run_index]) * (displacement[:, None] - displacement[previous])
+    peak_rows = np.nanargmax(np.where(has_reading, force, -np.inf), axis=0)
+    runs = pd.DataFrame({
+        'Run': [column[len(FORCE_COLUMN) + 1:] for column in force_columns],
+        'Peak Force (N)': force[peak_rows, run_index],
+        'Displacement at Peak (mm)': displacement[peak_rows],
+        'Work (mJ)': np.where(segment, areas, 0).sum(axis=0),
+        'Readings': has_reading.sum(axis=0),
+    })
+    return pd.DataFrame(envelope), runs
+
+
+def process_excel_files(folder_path, output_path, resolution=0.01, method=ALIGN_METHODS[0], use_cache=True, workers=None,
+                        incremental=False, output_format=OUTPUT_FORMATS[0], summaries=True):
+    """
+    Combine the test files in folder_path into one sheet per needle count and test type.
+
+    With incremental=True and a manifest from an earlier run with the same settings, only the
+    sheets that gained, lost or had a changed file are rebuilt and rewritten; the other sheets
+    of the output are left as they are. "xlsx-stream" output cannot keep sheets, so it is
+    always rebuilt in full. With summaries=True, each sheet gets "<sheet>_envelope" and
+    "<sheet>_runs" summary sheets from summarize_sheet().
+    """
+    # Sheet of each test file in the folder
+    sheet_names = {}
+    for file_name in sorted(os.listdir(folder_path)):
+        if not file_name.endswith(".xlsx") or os.path.abspath(os.path.join(folder_path, file_name)) == os.path.abspath(output_path):
+            continue
+
+        # Create a sheet name based on test type and needle count
+        sheet_name = sheet_name_for(file_name)
+        if sheet_name is None:
+            logging.warning(f"Skipping file {file_name} due to unexpected filename format.")
+            continue
+        sheet_names[file_name] = sheet_name
+
+    # Work out which sheets need rebuilding
+    settings = {'resolution': resolution, 'align': method, 'format': output_format, 'summaries': summaries}
+    signatures = {file_name: file_signature(os.path.join(folder_path, file_name)) for file_name in sheet_names}
+    current = {}
+    for file_name, sheet_name in sheet_names.items():
+        current.setdefault(sheet_name, {})[file_name] = signatures[file_name]
+    previous = load_manifest(output_path, settings) if incremental and output_format in PARTIAL_UPDATE_FORMATS else None
+    if previous is None:
+        affected = set(current)
+        removed = set()
+    else:
+        affected = {sheet_name for sheet_name, files in current.items() if previous.get(sheet_name) != files}
+        removed = set(previous) - set(current)
+        logging.info(f'{len(affected)} sheets to update, {len(current) - len(affected)} unchanged')
+        if not affected and not removed:
+            logging.info('Nothing new to combine.')
+            return
+
+    # Runs to combine, grouped by output sheet
+    runs_by_sheet = {}
+    file_names = [file_name for file_name, sheet_name in sheet_names.items() if sheet_name in affected]
+    runs = load_runs(folder_path, file_names, use_cache, workers)
+    for file_name in file_names:
+        if file_name not in runs:
+            continue
+        displacement, force = runs[file_name]
+        # Name the force column after the file to avoid conflicts
+        runs_by_sheet.setdefault(sheet_names[file_name], []).append((f'{FORCE_COLUMN}_{file_name}', displacement, force))
+
+    # Align each sheet's runs on one displacement grid, in one step per sheet
     data_dict = {}
+    for sheet_name, sheet_runs in runs_by_sheet.items():
+        logging.info(f'Adding sheet {sheet_name} ({len(sheet_runs)} runs)')
+        data_dict[sheet_name] = align_runs(sheet_runs, resolution, method)
+    # A sheet whose files could all not be read is dropped from the output
+    removed |= affected - set(data_dict)
+
+    if summaries:
+        for sheet_name, data in list(data_dict.items()):
+            data_dict[sheet_name + SUMMARY_SUFFIXES[0]], data_dict[sheet_name + SUMMARY_SUFFIXES[1]] = summarize_sheet(data)
+        removed = removed | {sheet_name + suffix for sheet_name in removed for suffix in SUMMARY_SUFFIXES}
 
-    # Iterate over each file in the folder
-    for file_name in os.listdir(folder_path):
-        print(file_name)
-        if file_name.endswith(".xlsx"):
-            file_path = os.path.join(folder_path, file_name)
-            
-            # Extract details from the file name (assuming format is X_X_X_X.xlsx)
-            file_parts = file_name.split('_')
-            if len(file_parts) < 3:
-                logging.warning(f"Skipping file {file_name} due to unexpected filename format.")
-                continue
-            
-            num_needles = file_parts[0]
-            test_type = file_parts[3]  # "c" or "i"
-            
-            # Create a sheet name based on test type and needle count
-            sheet_name = f"{num_needles}_needle_{test_type}"
-
-            try:
-                # Read the Excel file
-                df = pd.read_excel(file_path)
-            except Exception as e:
-                logging.error(f"Failed to read file {file_name}: {str(e)}")
-                continue
-            
-            # Check if "Displacement (mm)" column exists
-            displacement_column = 'Displacement (mm)'
-            if displacement_column not in df.columns:
-                logging.warning(f"'{displacement_column}' column not found in {file_name}. Skipping file.")
-                continue
-
-            # Round displacement values to 2 decimal places
-            df[displacement_column] = df[displacement_column].round(2)
-
-            # Select only "Force (N)" and "Displacement (mm)" columns
-            df_subset = df[[displacement_column, 'Force (N)']]
-
-            # Rename "Force (N)" column uniquely based on the file name to avoid conflicts
-            df_subset = df_subset.rename(columns={'Force (N)': f'Force (N)_{file_name}'})
-
-            # If the sheet_name doesn't exist in the dictionary, initialize it with the first dataset
-            if sheet_name not in data_dict:
-                logging.info(f'Adding sheet {sheet_name}')
-                data_dict[sheet_name] = df_subset
-            else:
-                # Merge on "Displacement (mm)" to keep a single displacement column and add force columns
-                logging.info('Merging data')
-                data_dict[sheet_name] = pd.merge(data_dict[sheet_name], 
-                                                 df_subset, 
-                                                 how='outer', 
-                                                 on=displacement_column)
-
-    # Write to the output Excel file with separate sheets
+    # Write the output with separate sheets; an incremental update only touches the affected ones.
+    # A full rebuild first drops any manifest describing the file it is about to replace
+    if previous is None:
+        remove_manifests(output_path, output_format)
     try:
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-            for sheet_name, data in data_dict.items():
-                data.to_excel(writer, sheet_name=sheet_name, index=False)
+        write_output(output_path, output_format, data_dict, removed, update=previous is not None)
     except Exception as e:
         logging.error(f"Failed to write to output file: {str(e)}")
         return
 
+    # Record only the files that made it into the output
+    sheets = {} if previous is None else {sheet_name: files for sheet_name, files in previous.items()
+                                           if sheet_name not in removed and sheet_name not in affected}
+    for file_name in file_names:
+        if file_name in runs:
+            sheets.setdefault(sheet_names[file_name], {})[file_name] = signatures[file_name]
+    # Only formats that can be updated in place ever read their manifest back
+    if output_format in PARTIAL_UPDATE_FORMATS:
+        save_manifest(output_path, settings, sheets)
+
     logging.info('Done!')
 
-# Folder containing your Excel files
-folder_path = 'C:\\Users\\cneje\\Downloads\\2025-06-30_BM_MNAs'
 
-# Output file path
-output_file = 'C:\\Users\\cneje\\Downloads\\2025-06-30_BM_MNAs\\combined_data.xlsx'
+def main():
+    parser = argparse.ArgumentParser(description="Combine force/displacement test files into one sheet per needle count and test type.")
+    # Folder containing your Excel files
+    parser.add_argument("folder", nargs="?", default='C:\\Users\\cneje\\Downloads\\2025-06-30_BM_MNAs')
+    # Output file path (default: combined_data.xlsx in the folder, or as suits --format)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default=OUTPUT_FORMATS[0],
+                        help="csv and parquet write a folder with one file per sheet")
+    parser.add_argument("--resolution", type=float, default=0.01, help="displacement grid spacing (mm)")
+    parser.add_argument("--align", choices=ALIGN_METHODS, default=ALIGN_METHODS[0],
+                        help="bin readings to the nearest grid point, or interpolate force at the grid points")
+    parser.add_argument("--workers", type=int, default=None, help="processes reading files (default: one per CPU)")
+    parser.add_argument("--no-cache", action="store_true", help=f"re-read every file and leave {CACHE_DIR_NAME} alone")
+    parser.add_argument("--no-summaries", action="store_true",
+                        help="skip the per-sheet envelope (mean, std, percentiles) and per-run peak/work sheets")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only rebuild the sheets with new, changed or removed files since the last run")
+    args = parser.parse_args()
+
+    output_file = args.output or os.path.join(args.folder, DEFAULT_OUTPUT_NAMES[args.format])
+
+    # Run the function to process files and create the output
+    process_excel_files(args.folder, output_file, args.resolution, args.align, not args.no_cache, args.workers,
+                        args.incremental, args.format, not args.no_summaries)
+
 
-# Run the function to process files and create the output
-process_excel_files(folder_path, output_file)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
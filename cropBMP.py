@@ -1,30 +1,161 @@
-from PIL import Image
+import argparse
+import io
+import mmap
 import os
+import struct
+
+import numpy as np
+from PIL import Image
 
-# Directory containing BMP images
-input_dir = 'C:\\Users\\cneje\\Downloads\\2024_10_22-24_MNA_Testing'
-output_dir = 'C:\\Users\\cneje\\Downloads\\2024_10_22-24_MNA_Testing\\Cropped'
+from imageFormats import add_format_arguments, check_format_arguments, executor_for, output_name, save_image
 
 # Desired crop size (left, upper, right, lower)
-crop_box = (150, 200, 2592, 1809)
+CROP_BOX = (150, 200, 2592, 1809)
+
+# Bits per pixel the memory-mapped path can slice on whole bytes
+_BYTE_ALIGNED_BPP = (8, 16, 24, 32)
+_BI_RGB, _BI_BITFIELDS = 0, 3
+
+
+def _bmp_layout(data):
+    """
+    Header fields of an uncompressed BMP, or None if the file needs decoding by PIL.
+
+    Returns (pixel offset, width, height, bits per pixel) with height negative for a
+    top-down bitmap, as stored.
+    """
+    if len(data) < 54 or data[:2] != b'BM':
+        return None
+    pixel_offset, header_size = struct.unpack_from('<II', data, 10)
+    if header_size < 40:
+        return None  # OS/2 core header
+    width, height, planes, bpp, compression = struct.unpack_from('<iiHHI', data, 18)
+    if width <= 0 or height == 0 or planes != 1 or bpp not in _BYTE_ALIGNED_BPP:
+        return None
+    if compression != _BI_RGB and not (compression == _BI_BITFIELDS and bpp in (16, 32)):
+        return None
+    if header_size >= 124 and struct.unpack_from('<I', data, 14 + 116)[0]:
+        return None  # embedded colour profile stored after the pixels
+    stride = (width * bpp + 31) // 32 * 4
+    if pixel_offset + stride * abs(height) > len(data):
+        return None
+    return pixel_offset, width, height, bpp
+
+
+def crop_bmp_bytes(src, crop_box):
+    """
+    Crop an uncompressed BMP by slicing rows of its memory-mapped pixel array.
+
+    Only the rows inside the crop box are touched, and the headers (and palette) are copied
+    with the size fields patched. Returns the cropped BMP file as a bytes-like buffer, or None
+    when the file is not an uncompressed BMP or the box does not fit inside the image.
+    """
+    left, upper, right, lower = crop_box
+    with open(src, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        layout = _bmp_layout(data)
+        if layout is None:
+            return None
+        pixel_offset, width, height, bpp = layout
+        rows = abs(height)
+        if not (0 <= left < right <= width and 0 <= upper < lower <= rows):
+            return None
+
+        bytes_per_pixel = bpp // 8
+        stride = (width * bpp + 31) // 32 * 4
+        pixels = np.frombuffer(data, dtype=np.uint8, count=stride * rows, offset=pixel_offset).reshape(rows, stride)
+        # Bottom-up bitmaps store the last image row first
+        first_row, last_row = (upper, lower) if height < 0 else (rows - lower, rows - upper)
+        block = pixels[first_row:last_row, left * bytes_per_pixel:right * bytes_per_pixel]
+
+        out_width, out_rows = right - left, lower - upper
+        out_stride = (out_width * bpp + 31) // 32 * 4
+        out = np.zeros(pixel_offset + out_rows * out_stride, dtype=np.uint8)
+        out[:pixel_offset] = np.frombuffer(data, dtype=np.uint8, count=pixel_offset)
+        out[pixel_offset:].reshape(out_rows, out_stride)[:, :block.shape[1]] = block
+        del block, pixels  # release the views before the map closes
+
+    header = out[:pixel_offset].data.cast('B')
+    struct.pack_into('<I', header, 2, len(out))
+    struct.pack_into('<ii', header, 18, out_width, -out_rows if height < 0 else out_rows)
+    struct.pack_into('<I', header, 34, len(out) - pixel_offset)
+    return out.data
+
+
+def crop_image(src, crop_box=CROP_BOX):
+    """Crop one image into memory, by memory map when possible. Returns a PIL image."""
+    cropped = crop_bmp_bytes(src, crop_box) if src.lower().endswith(".bmp") else None
+    if cropped is not None:
+        return Image.open(io.BytesIO(cropped))
+    with Image.open(src) as img:
+        return img.crop(crop_box)
+
+
+def crop_file(src, dst, crop_box=CROP_BOX, output_format="bmp", level=None):
+    """
+    Crop one image, by memory map when possible, and save it in output_format.
+
+    Returns "mmap" or "pil" for the crop path taken.
+    """
+    cropped = crop_bmp_bytes(src, crop_box) if src.lower().endswith(".bmp") else None
+    if cropped is not None and output_format == "bmp":
+        # Already a BMP file, so write it as is
+        with open(dst, 'wb') as f:
+            f.write(cropped)
+    elif cropped is not None:
+        save_image(Image.open(io.BytesIO(cropped)), dst, output_format, level)
+    else:
+        with Image.open(src) as img:
+            save_image(img.crop(crop_box), dst, output_format, level)
+    return "mmap" if cropped is not None else "pil"
+
+
+def crop_images(input_dir, output_dir, crop_box=CROP_BOX, extensions=(".bmp",), workers=None,
+                output_format="bmp", level=None):
+    """
+    Crop every image in input_dir into output_dir, saved in output_format.
+
+    Files are spread over a pool of workers: threads for PNG output, processes otherwise
+    (see imageFormats.executor_for).
+    """
+    # Create output directory if it doesn't exist
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    filenames = [filename for filename in sorted(os.listdir(input_dir)) if filename.lower().endswith(tuple(extensions))]
+    sources = [os.path.join(input_dir, filename) for filename in filenames]
+    destinations = [os.path.join(output_dir, output_name(filename, output_format)) for filename in filenames]
+    jobs = (sources, destinations, [tuple(crop_box)] * len(filenames),
+            [output_format] * len(filenames), [level] * len(filenames))
+
+    if workers == 1 or len(filenames) < 2:
+        paths = map(crop_file, *jobs)
+        for filename, path in zip(filenames, paths):
+            print(f"Cropped and saved: {filename} ({path})")
+    else:
+        with executor_for(output_format, workers) as pool:
+            paths = pool.map(crop_file, *jobs, chunksize=8)
+            for filename, path in zip(filenames, paths):
+                print(f"Cropped and saved: {filename} ({path})")
 
-# Create output directory if it doesn't exist
-if not os.path.exists(output_dir):
-    os.makedirs(output_dir)
+    print("Cropping completed for all images.")
 
-# Iterate over all files in the input directory
-for filename in os.listdir(input_dir):
-    if filename.endswith(".bmp"):
-        # Open image
-        img_path = os.path.join(input_dir, filename)
-        img = Image.open(img_path)
 
-        # Crop image
-        cropped_img = img.crop(crop_box)
+def main():
+    parser = argparse.ArgumentParser(description="Crop every image in a folder to the same box.")
+    # Directory containing BMP images
+    parser.add_argument("input_dir", nargs="?", default='C:\\Users\\cneje\\Downloads\\2024_10_22-24_MNA_Testing')
+    parser.add_argument("output_dir", nargs="?", default=None, help="default: a Cropped folder inside input_dir")
+    parser.add_argument("--crop-box", type=int, nargs=4, default=CROP_BOX, metavar=("LEFT", "UPPER", "RIGHT", "LOWER"))
+    parser.add_argument("--extensions", nargs="+", default=[".bmp"],
+                        help="file types to crop; files other than uncompressed BMPs are cropped through PIL")
+    add_format_arguments(parser, "the cropped files")
+    parser.add_argument("--workers", type=int, default=None, help="files cropped in parallel (default: one per CPU)")
+    args = parser.parse_args()
+    check_format_arguments(parser, args)
 
-        # Save cropped image to the output directory
-        cropped_img.save(os.path.join(output_dir, filename))
+    output_dir = args.output_dir or os.path.join(args.input_dir, 'Cropped')
+    crop_images(args.input_dir, output_dir, args.crop_box, args.extensions, args.workers, args.output_format, args.level)
 
-        print(f"Cropped and saved: {filename}")
 
-print("Cropping completed for all images.")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,661 @@
+# Serial acquisition engine for the force/displacement test stand (no GUI imports)
+# Headless run: python forceAcquisition.py --force-port COM5 --displacement-port COM6 --output run.csv
+import argparse
+import math
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+import serial
+
+from acquisitionTelemetry import AcquisitionTelemetry, run_metadata_path, save_run_metadata
+from lineParser import parse_force_buffer
+from sampleStore import SampleRing, SampleStore, SampleWriter
+
+FORCE_POLL_COMMAND = bytes.fromhex("3f0d")  # "?\r" asks the Mark-10 for the current reading
+DISPLACEMENT_POLL_COMMAND = bytes.fromhex("310d")  # "1\r" asks the indicator for the current reading
+
+# Commands that switch the gauge in and out of continuous output. The Mark-10 can be set to
+# transmit continuously from its RS-232 settings menu, in which case these stay None.
+FORCE_STREAM_START_COMMAND = None
+FORCE_STREAM_STOP_COMMAND = None
+
+ACQUISITION_MODES = ("Polled", "Streaming")
+
+# Where displacement zero is taken when a run is triggered: the triggering sample (as before
+# the pre-trigger buffer existed), the oldest pre-trigger sample, or the mean of the pre-trigger samples
+BASELINE_MODES = ("Trigger", "First", "Mean")
+
+# Net travel (mm) that settles which way the crosshead moves: five counts of the 0.01 mm
+# indicator, well above its reading noise. Until then displacement is recorded unsigned
+DIRECTION_THRESHOLD = 0.05
+
+# Upper bound on the gauge's continuous output rate, used to size the pre-trigger buffer
+MAX_STREAM_RATE = 1000
+
+# One reading from one sensor: tick index, perf_counter() time of the request and the decoded line
+RawSample = namedtuple("RawSample", ["tick", "time", "raw"])
+
+# Consecutive streamed readings: tick index of the first, and arrays of perf_counter() times
+# and parsed values (NaN for an invalid line)
+SampleBatch = namedtuple("SampleBatch", ["tick", "times", "values"])
+
+
+def parse_force(raw_data):
+    # Example force format: "1.23 N"
+    return float(raw_data.replace(" N", ""))
+
+
+def parse_displacement(raw_data):
+    # Example displacement format: "01A+00024.35"
+    if not raw_data.startswith("01A"):
+        raise ValueError(f"not a displacement reading: {raw_data!r}")
+    return float(raw_data[3:])  # Extract the number after "01A"
+
+
+def sample_value(sample, parse):
+    """The sample's reading, parsed with parse(). Raises ValueError if invalid."""
+    value = parse(sample.raw)
+    if math.isnan(value):
+        raise ValueError(f"invalid reading: {sample.raw!r}")
+    return value
+
+
+def open_connection(port, baud_rate, timeout):
+    """
+    Open a sensor port. Names starting with "sim:" open a simulated sensor from
+    simulatedSensors.py instead of a real serial port.
+    """
+    if port.startswith("sim:"):
+        from simulatedSensors import open_simulated_port
+        return open_simulated_port(port, timeout)
+    return serial.Serial(port, baud_rate, timeout=timeout)
+
+
+class SampleScheduler:
+    """
+    Paces polling on absolute perf_counter_ns deadlines, one period apart.
+
+    Deadlines are fixed to a grid from the first tick, so sleep and loop overheads do not
+    accumulate and the mean rate matches the requested one. A tick that is late by less than
+    a period is released at once to catch up; when whole periods are missed they are skipped,
+    counted in `overruns`, and the grid continues. Can be used as a barrier action.
+    """
+
+    def __init__(self, readings_per_sec):
+        self._lock = threading.Lock()
+        self.set_rate(readings_per_sec)
+
+    def set_rate(self, readings_per_sec):
+        """Change the rate and restart the grid and the rate statistics at the next tick."""
+        with self._lock:
+            self.readings_per_sec = readings_per_sec
+            self.period_ns = round(1e9 / readings_per_sec)
+            self.next_deadline_ns = None
+            self.first_tick_ns = None
+            self.last_tick_ns = None
+            self.ticks = 0
+            self.overruns = 0
+
+    def delay(self):
+        """Advance to the next deadline and return how long to wait for it, in seconds."""
+        with self._lock:
+            now = time.perf_counter_ns()
+            if self.next_deadline_ns is None:
+                self.next_deadline_ns = now
+                self.first_tick_ns = now
+            late = now - self.next_deadline_ns
+            if late >= self.period_ns:
+                missed = late // self.period_ns
+                self.overruns += missed
+                self.next_deadline_ns += missed * self.period_ns
+            wait_ns = self.next_deadline_ns - now
+            self.last_tick_ns = max(now, self.next_deadline_ns)
+            self.next_deadline_ns += self.period_ns
+            self.ticks += 1
+        return max(wait_ns, 0) / 1e9
+
+    def __call__(self):
+        wait = self.delay()
+        if wait > 0:
+            time.sleep(wait)
+
+    def measured_rate(self):
+        """Ticks per second actually achieved since the grid was started."""
+        with self._lock:
+            if self.ticks < 2:
+                return 0.0
+            return (self.ticks - 1) * 1e9 / (self.last_tick_ns - self.first_tick_ns)
+
+
+class PolledSensorReader(threading.Thread):
+    """
+    Poll one serial sensor in its own thread and push RawSample tuples into a queue.
+
+    When a barrier is given, every reader sharing it sends its poll command on the same
+    tick, so a pair of samples costs the latency of the slower port instead of the sum of both.
+    With a telemetry object, each poll's round-trip time and timeouts are reported under `port`.
+    """
+
+    def __init__(self, connection, command, output_queue, stop_event, barrier=None, name=None,
+                 telemetry=None, port=None):
+        super().__init__(name=name, daemon=True)
+        self.connection = connection
+        self.command = command
+        self.output_queue = output_queue
+        self.stop_event = stop_event
+        self.barrier = barrier
+        self.telemetry = telemetry
+        self.port = port
+
+    def run(self):
+        tick = 0
+        while not self.stop_event.is_set():
+            if self.barrier is not None:
+                try:
+                    self.barrier.wait()
+                except threading.BrokenBarrierError:
+                    break
+            try:
+                self.connection.write(self.command)
+                request_time = time.perf_counter()
+                line = self.connection.readline()
+            except (serial.SerialException, OSError) as e:
+                print(f"{self.name}: serial read failed: {e}")
+                if self.telemetry is not None:
+                    self.telemetry.record_error(self.port, str(e))
+                break
+            if self.telemetry is not None:
+                # readline() returns without the newline when the port timeout ran out
+                self.telemetry.record_reply(self.port, time.perf_counter() - request_time,
+                                            timed_out=not line.endswith(b"\n"))
+            raw = line.decode('utf-8', errors='replace').strip()
+            self.output_queue.put(RawSample(tick, request_time, raw))
+            tick += 1
+
+        # Let the partner reader and the merger know this stream has ended
+        self.stop_event.set()
+        if self.barrier is not None:
+            self.barrier.abort()
+        self.output_queue.put(None)
+
+
+class StreamingSensorReader(threading.Thread):
+    """
+    Read a sensor that transmits continuously and push SampleBatch tuples into a queue.
+
+    Each pass reads everything waiting in the port buffer with read(in_waiting). Complete lines
+    are collected until there are batch_lines of them or batch_interval seconds have passed,
+    then parsed together with lineParser and queued as one batch, so the engine and store
+    handle a few arrays per interval rather than one tuple per line. Lines of a batch are given timestamps spread evenly between
+    the previous batch's last line and this one's, since the port does not say when each arrived.
+    """
+
+    def __init__(self, connection, output_queue, stop_event, start_command=None, stop_command=None, name=None,
+                 telemetry=None, port=None, batch_lines=64, batch_interval=0.02):
+        super().__init__(name=name, daemon=True)
+        self.connection = connection
+        self.output_queue = output_queue
+        self.stop_event = stop_event
+        self.start_command = start_command
+        self.stop_command = stop_command
+        self.telemetry = telemetry
+        self.port = port
+        self.batch_lines = batch_lines
+        self.batch_interval = batch_interval
+
+    def run(self):
+        tick = 0
+        buffer = b""
+        lines_waiting = 0
+        try:
+            self.connection.reset_input_buffer()
+            if self.start_command is not None:
+                self.connection.write(self.start_command)
+            previous_batch_time = last_line_time = time.perf_counter()
+
+            while not self.stop_event.is_set():
+                # Block for at most one byte (up to the port timeout) when nothing is waiting
+                chunk = self.connection.read(self.connection.in_waiting or 1)
+                if chunk:
+                    buffer += chunk
+                    newlines = chunk.count(b"\n")
+                    if newlines:
+                        lines_waiting += newlines
+                        last_line_time = time.perf_counter()
+                if not lines_waiting or (lines_waiting < self.batch_lines
+                                         and last_line_time - previous_batch_time < self.batch_interval):
+                    continue
+
+                parsed, buffer = parse_force_buffer(buffer)
+                lines_waiting = 0
+                count = len(parsed.values)
+                if count:
+                    times = previous_batch_time + (last_line_time - previous_batch_time) * (np.arange(1, count + 1) / count)
+                    self.output_queue.put(SampleBatch(tick, times, parsed.values))
+                    tick += count
+                previous_batch_time = last_line_time
+
+            if self.stop_command is not None:
+                self.connection.write(self.stop_command)
+        except (serial.SerialException, OSError) as e:
+            print(f"{self.name}: serial read failed: {e}")
+            if self.telemetry is not None:
+                self.telemetry.record_error(self.port, str(e))
+
+        self.stop_event.set()
+        self.output_queue.put(None)
+
+
+def merge_samples(force_queue, displacement_queue, stop_event, poll_timeout=0.5):
+    """
+    Pair force and displacement samples taken on the same tick.
+
+    Yields (force_sample, displacement_sample) until stop_event is set or either reader ends.
+    A sample whose partner never arrived is dropped rather than paired with the wrong tick.
+    """
+    force_sample = None
+    displacement_sample = None
+    while not stop_event.is_set():
+        try:
+            if force_sample is None:
+                force_sample = force_queue.get(timeout=poll_timeout)
+                if force_sample is None:
+                    return
+            if displacement_sample is None:
+                displacement_sample = displacement_queue.get(timeout=poll_timeout)
+                if displacement_sample is None:
+                    return
+        except queue.Empty:
+            continue
+
+        if force_sample.tick < displacement_sample.tick:
+            force_sample = None
+        elif displacement_sample.tick < force_sample.tick:
+            displacement_sample = None
+        else:
+            yield force_sample, displacement_sample
+            force_sample = None
+            displacement_sample = None
+
+
+def merge_streamed_samples(force_queue, displacement_queue, stop_event, poll_timeout=0.5):
+    """
+    Pair each batch of streamed force samples with the most recent displacement sample.
+
+    Force arrives in batches at the gauge's native rate while displacement is still polled, so
+    each displacement reading is held until the next one arrives. Yields
+    (SampleBatch, displacement RawSample).
+    """
+    displacement_sample = None
+    while not stop_event.is_set():
+        try:
+            batch = force_queue.get(timeout=poll_timeout)
+        except queue.Empty:
+            continue
+        if batch is None:
+            return
+
+        # Keep only the newest displacement reading
+        while True:
+            try:
+                item = displacement_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return
+            displacement_sample = item
+
+        if displacement_sample is None:
+            continue
+        yield batch, displacement_sample
+
+
+def start_polled_readers(force_connection, displacement_connection, scheduler, stop_event, telemetry=None):
+    """
+    Start one reader thread per sensor, paced by a SampleScheduler.
+
+    Returns (force_queue, displacement_queue, readers).
+    """
+    force_queue = queue.Queue()
+    displacement_queue = queue.Queue()
+    barrier = threading.Barrier(2, action=scheduler)
+    readers = [
+        PolledSensorReader(force_connection, FORCE_POLL_COMMAND, force_queue, stop_event, barrier,
+                           name="force-reader", telemetry=telemetry, port="force"),
+        PolledSensorReader(displacement_connection, DISPLACEMENT_POLL_COMMAND, displacement_queue, stop_event, barrier,
+                           name="displacement-reader", telemetry=telemetry, port="displacement"),
+    ]
+    for reader in readers:
+        reader.start()
+    return force_queue, displacement_queue, readers
+
+
+def start_streaming_readers(force_connection, displacement_connection, scheduler, stop_event, telemetry=None,
+                            start_command=FORCE_STREAM_START_COMMAND, stop_command=FORCE_STREAM_STOP_COMMAND):
+    """
+    Stream the force gauge and poll the displacement sensor at the scheduler's rate.
+
+    Returns (force_queue, displacement_queue, readers) like start_polled_readers.
+    """
+    force_queue = queue.Queue()
+    displacement_queue = queue.Queue()
+    # A one-party barrier just paces the displacement reader
+    barrier = threading.Barrier(1, action=scheduler)
+    readers = [
+        StreamingSensorReader(force_connection, force_queue, stop_event, start_command, stop_command,
+                              name="force-stream", telemetry=telemetry, port="force"),
+        PolledSensorReader(displacement_connection, DISPLACEMENT_POLL_COMMAND, displacement_queue, stop_event, barrier,
+                           name="displacement-reader", telemetry=telemetry, port="displacement"),
+    ]
+    for reader in readers:
+        reader.start()
+    return force_queue, displacement_queue, readers
+
+
+def stop_readers(readers, stop_event, timeout=1.0):
+    """Signal the reader threads to finish and wait for them."""
+    stop_event.set()
+    for reader in readers:
+        if getattr(reader, "barrier", None) is not None:
+            reader.barrier.abort()
+    for reader in readers:
+        reader.join(timeout)
+
+
+class AcquisitionEngine:
+    """
+    Record one force/displacement run into a SampleStore.
+
+    While the force is below start_force, the last pretrigger_seconds of paired samples are
+    kept in a SampleRing. When the start force is reached the run's timeline starts at the
+    triggering sample, the ring is flushed into the store with negative timestamps so the
+    onset of loading is kept, and displacement is zeroed according to `baseline` (one of
+    BASELINE_MODES). Travel is recorded as positive once the readings have moved
+    direction_threshold from the oldest kept reading; before that displacement is unsigned,
+    as it always was. Velocity is left to processRun.py, which works on the whole run. Pairs with
+    an invalid reading are skipped and counted in `telemetry`, which also collects the port
+    latencies, timeouts and sample timing of the run.
+
+    While waiting for the trigger the sensors are polled at pretrigger_readings_per_sec
+    (default: the recording rate). run() blocks until stop() is called or a reader ends, so
+    callers normally run it on its own thread.
+    """
+
+    def __init__(self, force_connection, displacement_connection, store, readings_per_sec, start_force,
+                 mode=ACQUISITION_MODES[0], pretrigger_readings_per_sec=None, pretrigger_seconds=1.0,
+                 baseline=BASELINE_MODES[0], direction_threshold=DIRECTION_THRESHOLD):
+        self.force_connection = force_connection
+        self.displacement_connection = displacement_connection
+        self.store = store
+        self.readings_per_sec = readings_per_sec
+        self.pretrigger_readings_per_sec = pretrigger_readings_per_sec or readings_per_sec
+        self.start_force = start_force
+        self.mode = mode
+        self.stop_event = threading.Event()
+        self.scheduler = SampleScheduler(self.pretrigger_readings_per_sec)
+        self.telemetry = AcquisitionTelemetry(self.pretrigger_readings_per_sec,
+                                              streamed="force" if mode == "Streaming" else None)
+
+        # Last pretrigger_seconds of (force time, force, displacement time, displacement)
+        self.pretrigger_seconds = pretrigger_seconds
+        self.baseline = baseline
+        ring_rate = MAX_STREAM_RATE if mode == "Streaming" else self.pretrigger_readings_per_sec
+        self.pretrigger = SampleRing(math.ceil(pretrigger_seconds * ring_rate) + 1, 4)
+
+        self.triggered = False
+        self.initial_displacement = 0
+        self.direction = 0.0  # +1 or -1 to make travel positive, 0 until known
+        self.direction_threshold = direction_threshold
+        self.direction_reference = 0  # reading the net travel is measured from
+        self.start_time = 0
+
+    def stop(self):
+        self.stop_event.set()
+
+    def measured_rate(self):
+        """Samples per second actually recorded from the trigger on, from the stored force timestamps."""
+        # Pre-trigger rows (negative times) were polled at the pre-trigger rate, so they are left out
+        times = self.store.snapshot()["time_f"]
+        times = times[times >= 0]
+        if len(times) < 2:
+            return 0.0
+        elapsed = times[-1] - times[0]
+        return (len(times) - 1) / elapsed if elapsed > 0 else 0.0
+
+    def run_metadata(self):
+        """Settings and telemetry of the run, for saving next to its data."""
+        return {
+            "mode": self.mode,
+            "readings_per_sec": self.readings_per_sec,
+            "pretrigger_readings_per_sec": self.pretrigger_readings_per_sec,
+            "pretrigger_seconds": self.pretrigger_seconds,
+            "baseline": self.baseline,
+            "start_force": self.start_force,
+            "triggered": self.triggered,
+            "samples": len(self.store),
+            "measured_rate": self.measured_rate(),
+            "overruns": self.scheduler.overruns,
+            "telemetry": self.telemetry.to_dict(),
+        }
+
+    def run(self):
+        # One reader thread per sensor
+        if self.mode == "Streaming":
+            start_readers, merge, process = start_streaming_readers, merge_streamed_samples, self.process_batch
+        else:
+            start_readers, merge, process = start_polled_readers, merge_samples, self.process_pair
+        force_queue, displacement_queue, readers = start_readers(
+            self.force_connection, self.displacement_connection, self.scheduler, self.stop_event, self.telemetry)
+        try:
+            for force, displacement_sample in merge(force_queue, displacement_queue, self.stop_event):
+                process(force, displacement_sample)
+        finally:
+            stop_readers(readers, self.stop_event)
+
+    def process_pair(self, force_sample, displacement_sample):
+        # An invalid reading is counted and the pair skipped, rather than recorded as a fake zero
+        try:
+            force_value = sample_value(force_sample, parse_force)
+        except ValueError:
+            self.telemetry.record_invalid("force")
+            return
+        try:
+            displacement_value = sample_value(displacement_sample, parse_displacement)
+        except ValueError:
+            self.telemetry.record_invalid("displacement")
+            return
+        self.telemetry.record_sample(force_sample.time, displacement_sample.time)
+
+        if not self.triggered:
+            self.pretrigger.push(force_sample.time, force_value, displacement_sample.time, displacement_value)
+            if force_value >= self.start_force:
+                self.trigger(force_sample.time, displacement_value)
+            return
+
+        self.record(force_sample.time, force_value, displacement_sample.time, displacement_value)
+
+    def process_batch(self, batch, displacement_sample):
+        """process_pair for a SampleBatch of streamed force readings sharing one displacement reading."""
+        valid = ~np.isnan(batch.values)
+        invalid = len(valid) - int(np.count_nonzero(valid))
+        if invalid:
+            self.telemetry.record_invalid("force", invalid)
+        times_f, forces = batch.times[valid], batch.values[valid]
+        if not len(times_f):
+            return
+        try:
+            displacement_value = sample_value(displacement_sample, parse_displacement)
+        except ValueError:
+            self.telemetry.record_invalid("displacement", len(times_f))
+            return
+        time_d = displacement_sample.time
+
+        if not self.triggered:
+            above = np.flatnonzero(forces >= self.start_force)
+            # Readings up to and including the triggering one go through the pre-trigger ring;
+            # the trigger restarts the sample timing, so the rest are counted after it
+            split = above[0] + 1 if len(above) else len(forces)
+            self.telemetry.record_samples(times_f[:split], time_d)
+            self.pretrigger.extend(np.column_stack((times_f[:split], forces[:split],
+                                                    np.full(split, time_d), np.full(split, displacement_value))))
+            if not len(above):
+                return
+            self.trigger(times_f[split - 1], displacement_value)
+            times_f, forces = times_f[split:], forces[split:]
+
+        self.telemetry.record_samples(times_f, time_d)
+        self.record_block(times_f, forces, time_d, displacement_value)
+
+    def trigger(self, trigger_time, trigger_displacement):
+        """Start the run at trigger_time and flush the pre-trigger samples into the store."""
+        self.triggered = True
+        self.start_time = trigger_time
+        self.scheduler.set_rate(self.readings_per_sec)
+        self.telemetry.set_rate(self.readings_per_sec)
+
+        rows = self.pretrigger.ordered()
+        self.pretrigger.clear()
+        rows = rows[rows[:, 0] >= trigger_time - self.pretrigger_seconds]
+
+        # Set displacement starting point to zero
+        if self.baseline == "First":
+            self.initial_displacement = rows[0, 3]
+        elif self.baseline == "Mean":
+            self.initial_displacement = rows[:-1, 3].mean() if len(rows) > 1 else trigger_displacement
+        else:
+            self.initial_displacement = trigger_displacement
+
+        # The direction is settled by the first reading, pre-trigger ones included, that has
+        # moved far enough from the oldest one; a single noisy difference is not enough
+        self.direction = 0.0
+        self.direction_reference = rows[0, 3] if len(rows) else trigger_displacement
+
+        self.record_block(rows[:, 0], rows[:, 1], rows[:, 2], rows[:, 3])
+
+    def record(self, time_f, force_value, time_d, displacement_value):
+        current_time_f = time_f - self.start_time
+        current_time_d = time_d - self.start_time
+        delta_time_rec = current_time_f - current_time_d
+
+        offset = displacement_value - self.initial_displacement
+        if not self.direction:
+            self.settle_direction(displacement_value)
+        if self.direction:
+            # Start at 0 and count travel as positive; readings beyond the baseline stay negative
+            # (+ 0.0 turns -0.0 into 0.0)
+            adjusted_displacement = self.direction * offset + 0.0
+        else:
+            adjusted_displacement = self.unsigned(offset, current_time_f)
+
+        self.store.append(current_time_f, force_value, current_time_d, adjusted_displacement, delta_time_rec)
+
+    def record_block(self, times_f, forces, times_d, displacements):
+        """record() for arrays of rows in one store write; a scalar time_d or displacement is shared by all rows."""
+        times_f = np.asarray(times_f, dtype=float)
+        if not len(times_f):
+            return
+        displacements = np.broadcast_to(np.asarray(displacements, dtype=float), times_f.shape)
+        offsets = displacements - self.initial_displacement
+        current_times_f = times_f - self.start_time
+        current_times_d = np.asarray(times_d, dtype=float) - self.start_time
+
+        if self.direction:
+            adjusted = self.direction * offsets + 0.0
+        else:
+            # Rows before the one that settles the direction stay unsigned
+            settled = self.settle_direction(displacements)
+            adjusted = self.unsigned(offsets, current_times_f)
+            if settled is not None:
+                adjusted[settled:] = self.direction * offsets[settled:] + 0.0
+        self.store.extend(current_times_f, forces, current_times_d, adjusted, current_times_f - current_times_d)
+
+    def settle_direction(self, displacements):
+        """
+        Set the travel direction from the first of displacements that has moved at least
+        direction_threshold from the reference reading. Returns its index, or None if none has.
+        """
+        travel = np.atleast_1d(displacements) - self.direction_reference
+        moved = np.flatnonzero(np.abs(travel) >= self.direction_threshold)
+        if not len(moved):
+            return None
+        self.direction = 1.0 if travel[moved[0]] > 0 else -1.0
+        return moved[0]
+
+    def unsigned(self, offsets, current_times_f):
+        """
+        Displacement while the direction is unknown: the distance from the baseline, negated for
+        pre-trigger rows with the Trigger baseline.
+        """
+        adjusted = np.abs(offsets)
+        if self.baseline == "Trigger":
+            # Pre-trigger samples lie before the zero point
+            adjusted = np.where(np.asarray(current_times_f) < 0, -adjusted, adjusted)
+        return adjusted + 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record a force/displacement run without the GUI.")
+    parser.add_argument("--force-port", default="COM5", help="force gauge port (sim:force for a simulated gauge)")
+    parser.add_argument("--displacement-port", default="COM6", help="displacement sensor port (sim:displacement for a simulated one)")
+    parser.add_argument("--baud-rate", type=int, default=115200)
+    parser.add_argument("--rate", type=float, default=5, help="readings per second")
+    parser.add_argument("--pretrigger-rate", type=float, default=None,
+                        help="readings per second while waiting for the start force (default: --rate)")
+    parser.add_argument("--start-force", type=float, default=0.05, help="force (N) that starts recording")
+    parser.add_argument("--mode", choices=ACQUISITION_MODES, default=ACQUISITION_MODES[0])
+    parser.add_argument("--pretrigger-seconds", type=float, default=1.0,
+                        help="seconds of samples before the start force to keep (negative times)")
+    parser.add_argument("--baseline", choices=BASELINE_MODES, default=BASELINE_MODES[0],
+                        help="where displacement is zeroed: trigger sample, first or mean pre-trigger sample")
+    parser.add_argument("--duration", type=float, default=None, help="stop after this many seconds (default: Ctrl+C)")
+    parser.add_argument("--output", required=True, help="CSV file the run is streamed to")
+    args = parser.parse_args()
+
+    force_connection = open_connection(args.force_port, args.baud_rate, timeout=0.2)
+    displacement_connection = open_connection(args.displacement_port, args.baud_rate, timeout=0.2)
+
+    output_dir = os.path.dirname(os.path.abspath(args.output))
+    os.makedirs(output_dir, exist_ok=True)
+    store = SampleStore()
+    writer = SampleWriter(store, args.output)
+    engine = AcquisitionEngine(force_connection, displacement_connection, store, args.rate, args.start_force,
+                               args.mode, args.pretrigger_rate, args.pretrigger_seconds, args.baseline)
+
+    writer.start()
+    engine_thread = threading.Thread(target=engine.run, daemon=True)
+    engine_thread.start()
+    print(f"Recording to {args.output}, press Ctrl+C to stop.")
+
+    started = time.time()
+    try:
+        while engine_thread.is_alive():
+            engine_thread.join(1.0)
+            if args.duration is not None and time.time() - started >= args.duration:
+                break
+            print(f"{len(store)} samples recorded, {engine.telemetry.status_line()}" if engine.triggered or len(store)
+                  else f"Waiting for {args.start_force} N...")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop()
+        engine_thread.join()
+        force_connection.close()
+        displacement_connection.close()
+        writer.finish()
+        save_run_metadata(run_metadata_path(args.output), engine.run_metadata())
+    if args.mode == "Streaming":
+        # The gauge streams at its own rate; --rate only paces the displacement polls
+        rates = (f"force stream {engine.measured_rate():.2f} samples/s, "
+                 f"displacement {engine.scheduler.measured_rate():.2f}/{args.rate:g} polls/s")
+    else:
+        rates = f"measured {engine.measured_rate():.2f} samples/s, requested {args.rate:g}"
+    print(f"Saved {writer.rows_written} samples to {args.output} ({rates}, {engine.scheduler.overruns} overruns)")
+    print(engine.telemetry.status_line())
+
+
+if __name__ == "__main__":
+    main()
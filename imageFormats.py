@@ -0,0 +1,62 @@
+# Output formats shared by the image scripts (cropBMP.py, stichArrays_V2.py, imagePipeline.py)
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Name on the command line: (file extension, Pillow save options, encoder releases the GIL)
+OUTPUT_FORMATS = {
+    "bmp": (".bmp", {}, False),
+    "png": (".png", {}, True),
+    "tiff-deflate": (".tif", {"compression": "tiff_adobe_deflate"}, False),
+    "tiff-lzw": (".tif", {"compression": "tiff_lzw"}, False),
+}
+
+# Images the scripts read, including their own compressed output
+IMAGE_EXTENSIONS = (".bmp", ".png", ".tif", ".tiff")
+
+
+def output_name(filename, output_format="bmp"):
+    """filename with the extension of output_format, e.g. 2_MNA_5_1.png for "png"."""
+    return os.path.splitext(filename)[0] + OUTPUT_FORMATS[output_format][0]
+
+
+def save_image(img, path, output_format="bmp", level=None):
+    """
+    Save a PIL image in output_format.
+
+    level is the zlib compression level (0-9) of PNG output. TIFF deflate uses libtiff's
+    default level, as Pillow does not pass one through, and BMP and LZW have none, so a level
+    for any other format raises ValueError.
+    """
+    options = dict(OUTPUT_FORMATS[output_format][1])
+    if level is not None:
+        if output_format != "png":
+            raise ValueError(f"a compression level only applies to png output, not {output_format}")
+        options["compress_level"] = level
+    img.save(path, **options)
+
+
+def add_format_arguments(parser, what):
+    """Add the --format and --level options to an argparse parser; `what` names the files saved."""
+    parser.add_argument("--format", dest="output_format", choices=OUTPUT_FORMATS, default="bmp",
+                        help=f"format of {what} (png and tiff-* are lossless and compressed)")
+    parser.add_argument("--level", type=int, choices=range(10), default=None, metavar="0-9",
+                        help="PNG compression level (default: Pillow's, 6); png only")
+
+
+def check_format_arguments(parser, args):
+    """Reject --level with a format it does not apply to, before any file is written."""
+    if args.level is not None and args.output_format != "png":
+        parser.error(f"--level only applies to --format png, not {args.output_format}")
+
+
+def executor_for(output_format, workers=None):
+    """
+    Pool for jobs that end by saving an image in output_format.
+
+    Pillow's PNG encoder releases the GIL while it compresses, as do its decoders and paste,
+    so PNG jobs run on threads, sharing memory and skipping process start-up. The libtiff
+    encoder holds the GIL, so TIFF, like BMP, uses processes.
+    """
+    if OUTPUT_FORMATS[output_format][2]:
+        return ThreadPoolExecutor(max_workers=workers)
+    return ProcessPoolExecutor(max_workers=workers)
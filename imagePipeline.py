@@ -0,0 +1,107 @@
+# One pass from raw captures to stitched array strips: crop, renumber and stitch without intermediate files
+# Example: python imagePipeline.py raw_captures combined --cropped-dir cropped
+import argparse
+import os
+from concurrent.futures import as_completed
+
+from PIL import Image
+
+from cropBMP import CROP_BOX, crop_image
+from imageFormats import (IMAGE_EXTENSIONS, add_format_arguments, check_format_arguments, executor_for, output_name,
+                          save_image)
+from stichArrays_V2 import group_filenames, plan_renames
+
+
+def plan_arrays(raw_dir, images_per_array=10):
+    """
+    Decide where every raw capture ends up, without reading or renaming any file.
+
+    Names are normalized and renumbered as normalize_and_renumber_arrays would rename them,
+    then grouped as stitch_images would group the renamed files. Returns
+    {group key: [(raw name, final name)]} in needle order.
+    """
+    plan = plan_renames(raw_dir)
+    raw_names = {plan.get(filename, filename): filename
+                 for filename in sorted(os.listdir(raw_dir)) if filename.lower().endswith(IMAGE_EXTENSIONS)}
+    images_by_group = group_filenames(raw_names, images_per_array)
+    return {group_key: [(raw_names[final_name], final_name) for needle_number, final_name in files]
+            for group_key, files in images_by_group.items()}
+
+
+def build_strip(raw_dir, output_dir, group_key, files, crop_box=CROP_BOX, cropped_dir=None,
+                output_format="bmp", level=None):
+    """
+    Crop, rotate and place each raw capture of one array into its strip, and save the strip.
+
+    Every capture is read once and cropped in memory; its size after cropping is the crop
+    box, so the strip is allocated up front. With cropped_dir, each cropped capture is also
+    saved there under its renumbered name. Everything is saved in output_format.
+    """
+    left, upper, right, lower = crop_box
+    # Rotating by 90 degrees swaps width and height
+    tile_width, tile_height = lower - upper, right - left
+    new_image = Image.new('RGB', (tile_width * len(files), tile_height))
+
+    for index, (raw_name, final_name) in enumerate(files):
+        cropped = crop_image(os.path.join(raw_dir, raw_name), crop_box)
+        if cropped_dir:
+            save_image(cropped, os.path.join(cropped_dir, output_name(final_name, output_format)), output_format, level)
+        new_image.paste(cropped.rotate(90, expand=True), (index * tile_width, 0))
+
+    output_path = os.path.join(output_dir, output_name(f"{group_key}_combined_before", output_format))
+    save_image(new_image, output_path, output_format, level)
+    return output_path
+
+
+def run_pipeline(raw_dir, output_dir, crop_box=CROP_BOX, images_per_array=10, cropped_dir=None, workers=None,
+                 output_format="bmp", level=None):
+    """
+    Build every array strip straight from the raw captures in raw_dir.
+
+    Gives the same strips as cropBMP.py, normalize_and_renumber_arrays and stitch_images run
+    one after the other, but leaves raw_dir untouched and writes nothing between the stages
+    unless cropped_dir is given. Arrays are spread over `workers` (default: up to 4), threads
+    for PNG output and processes otherwise.
+    """
+    for directory in (output_dir, cropped_dir):
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+    arrays = plan_arrays(raw_dir, images_per_array)
+    crop_box = tuple(crop_box)
+    if workers is None:
+        workers = min(4, os.cpu_count() or 1)
+
+    if workers == 1 or len(arrays) < 2:
+        for group_key, files in arrays.items():
+            output_path = build_strip(raw_dir, output_dir, group_key, files, crop_box, cropped_dir, output_format, level)
+            print(f"Saved combined image: {output_path}")
+        return
+
+    with executor_for(output_format, workers) as pool:
+        futures = [pool.submit(build_strip, raw_dir, output_dir, group_key, files, crop_box, cropped_dir,
+                               output_format, level)
+                   for group_key, files in arrays.items()]
+        for future in as_completed(futures):
+            print(f"Saved combined image: {future.result()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crop, renumber and stitch raw needle captures into array strips in one pass.")
+    parser.add_argument("raw_dir", help="folder of raw captures (left unchanged)")
+    parser.add_argument("output_dir", help="folder for the stitched strips")
+    parser.add_argument("--crop-box", type=int, nargs=4, default=CROP_BOX, metavar=("LEFT", "UPPER", "RIGHT", "LOWER"))
+    parser.add_argument("--images-per-array", type=int, default=10)
+    parser.add_argument("--cropped-dir", default=None,
+                        help="also save each cropped capture here under its renumbered name")
+    parser.add_argument("--workers", type=int, default=None, help="arrays built in parallel (default: up to 4)")
+    add_format_arguments(parser, "the strips and cropped files")
+    args = parser.parse_args()
+    check_format_arguments(parser, args)
+
+    run_pipeline(args.raw_dir, args.output_dir, args.crop_box, args.images_per_array, args.cropped_dir, args.workers,
+                 args.output_format, args.level)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# Parsing of raw sensor output a buffer at a time: one value array and validity mask per batch of lines
+from collections import namedtuple
+
+import numpy as np
+
+# values: float64 readings (NaN where invalid), valid: bool mask, errors: number of invalid lines
+ParsedLines = namedtuple("ParsedLines", ["values", "valid", "errors"])
+
+FORCE_UNIT = b" N"  # Mark-10 reply, e.g. "1.23 N"
+DISPLACEMENT_PREFIX = b"01A"  # indicator reply, e.g. "01A+00024.35"
+DISPLACEMENT_WIDTH = 12
+
+
+def _parse_buffer(buffer, prefix=b"", suffix=b"", width=None):
+    """
+    Parse every complete line of a bytes buffer as a number between prefix and suffix.
+
+    A plain float() per line: streamed batches are tens of lines, where this is several times
+    faster than NumPy, whose fixed cost per call only pays off over thousands of lines.
+    Returns (ParsedLines, remainder), remainder being the trailing partial line.
+    """
+    *lines, remainder = buffer.split(b"\n")
+    start, stop = len(prefix), -len(suffix) or None
+    values = []
+    for line in lines:
+        line = line.strip()
+        # Blank lines (e.g. the LF of a CR LF split across chunks) are not readings
+        if not line:
+            continue
+        if line.startswith(prefix) and line.endswith(suffix) and (width is None or len(line) == width):
+            try:
+                values.append(float(line[start:stop]))
+                continue
+            except ValueError:
+                pass
+        values.append(np.nan)
+
+    values = np.array(values, dtype=float)
+    valid = ~np.isnan(values)
+    return ParsedLines(values, valid, len(values) - int(np.count_nonzero(valid))), remainder
+
+
+def parse_force_buffer(buffer):
+    """Parse every complete force line, such as "1.23 N", in a bytes buffer. Returns (ParsedLines, remainder)."""
+    return _parse_buffer(buffer, suffix=FORCE_UNIT)
+
+
+def parse_displacement_buffer(buffer):
+    """Parse every complete displacement line, such as "01A+00024.35", in a bytes buffer. Returns (ParsedLines, remainder)."""
+    return _parse_buffer(buffer, prefix=DISPLACEMENT_PREFIX, width=DISPLACEMENT_WIDTH)
@@ -0,0 +1,255 @@
+# Blitted live plot for the force/displacement GUI
+import numpy as np
+
+
+def grow_limits(limits, low, high, margin):
+    """
+    Return axis limits that cover [low, high], or None if the current ones already do.
+
+    Limits grow by at least half their span each time so a steadily growing value (time,
+    displacement) only forces a handful of full redraws over a run.
+    """
+    lo, hi = limits
+    if low >= lo and high <= hi:
+        return None
+    span = hi - lo
+    if high > hi:
+        hi = max(high + margin, hi + span / 2)
+    if low < lo:
+        lo = min(low - margin, lo - span / 2)
+    return lo, hi
+
+
+class _PyramidLevel:
+    """Growable columns (min_i, min_x, min_y, max_i, max_x, max_y) for one level of a MinMaxPyramid."""
+
+    def __init__(self, capacity=256):
+        self.data = np.empty((6, capacity))
+        self.count = 0
+
+    def extend(self, entries):
+        needed = self.count + entries.shape[1]
+        if needed > self.data.shape[1]:
+            grown = np.empty((6, max(needed, 2 * self.data.shape[1])))
+            grown[:, :self.count] = self.data[:, :self.count]
+            self.data = grown
+        self.data[:, self.count:needed] = entries
+        self.count = needed
+
+
+def _interleave(entries):
+    """Turn (6, n) bucket entries into 2n (x, y) points, each bucket's min and max in sample order."""
+    min_i, min_x, min_y, max_i, max_x, max_y = entries
+    min_first = min_i <= max_i
+    x = np.empty(2 * len(min_i))
+    y = np.empty(2 * len(min_i))
+    x[0::2] = np.where(min_first, min_x, max_x)
+    y[0::2] = np.where(min_first, min_y, max_y)
+    x[1::2] = np.where(min_first, max_x, min_x)
+    y[1::2] = np.where(min_first, max_y, min_y)
+    return x, y
+
+
+class MinMaxPyramid:
+    """
+    Multi-resolution min/max decimation of one (x, y) line, built as samples arrive.
+
+    Level 0 keeps the lowest and highest y of every bucket of base_bucket samples; each level
+    above merges pairs of buckets from the level below. points() returns the finest level that
+    fits in max_points, so peaks such as the failure-force spike always survive while the
+    number of points drawn stays bounded however long the run is.
+    """
+
+    def __init__(self, max_points=2000, base_bucket=4):
+        self.max_points = max_points
+        self.base_bucket = base_bucket
+        self.reset()
+
+    def reset(self):
+        self.levels = []
+        self.samples_seen = 0
+        self.pending_x = np.empty(0)
+        self.pending_y = np.empty(0)
+
+    def extend(self, x, y):
+        """Add new samples, in order, to the pyramid."""
+        x = np.concatenate((self.pending_x, x))
+        y = np.concatenate((self.pending_y, y))
+        first_index = self.samples_seen - len(self.pending_x)
+        self.samples_seen += len(x) - len(self.pending_x)
+
+        buckets = len(x) // self.base_bucket
+        used = buckets * self.base_bucket
+        self.pending_x = x[used:]
+        self.pending_y = y[used:]
+        if buckets == 0:
+            return
+
+        bucket_x = x[:used].reshape(buckets, self.base_bucket)
+        bucket_y = y[:used].reshape(buckets, self.base_bucket)
+        rows = np.arange(buckets)
+        min_j = bucket_y.argmin(axis=1)
+        max_j = bucket_y.argmax(axis=1)
+        offsets = first_index + rows * self.base_bucket
+        entries = np.vstack((offsets + min_j, bucket_x[rows, min_j], bucket_y[rows, min_j],
+                             offsets + max_j, bucket_x[rows, max_j], bucket_y[rows, max_j]))
+        self._add_entries(0, entries)
+
+    def _add_entries(self, level_index, entries):
+        while entries.shape[1]:
+            if level_index == len(self.levels):
+                self.levels.append(_PyramidLevel())
+            level = self.levels[level_index]
+            level.extend(entries)
+
+            # Merge every complete pair of buckets that the level above has not seen yet
+            merged = 2 * self.levels[level_index + 1].count if level_index + 1 < len(self.levels) else 0
+            pairs = (level.count - merged) // 2
+            if pairs == 0:
+                return
+            first = level.data[:, merged:merged + 2 * pairs:2]
+            second = level.data[:, merged + 1:merged + 2 * pairs:2]
+            take_min = np.where(first[2] <= second[2], first[:3], second[:3])
+            take_max = np.where(first[5] >= second[5], first[3:], second[3:])
+            entries = np.vstack((take_min, take_max))
+            level_index += 1
+
+    def points(self):
+        """Return decimated (x, y) arrays covering every sample added so far."""
+        if not self.levels:
+            return self.pending_x, self.pending_y
+
+        chosen = len(self.levels) - 1
+        for index, level in enumerate(self.levels):
+            if 2 * level.count <= self.max_points:
+                chosen = index
+                break
+
+        parts = [_interleave(self.levels[chosen].data[:, :self.levels[chosen].count])]
+        # Buckets below the chosen level that have not been merged upwards yet, oldest first
+        for index in range(chosen - 1, -1, -1):
+            level = self.levels[index]
+            merged = 2 * self.levels[index + 1].count
+            if level.count > merged:
+                parts.append(_interleave(level.data[:, merged:level.count]))
+        parts.append((self.pending_x, self.pending_y))
+        return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+
+class LivePlotRenderer:
+    """
+    Draw the force vs displacement and velocity vs time lines of a running test.
+
+    The figure background (axes, ticks, labels) is cached after every full draw and only the
+    two lines are redrawn on top of it. The lines are drawn from MinMaxPyramid decimations, so
+    each frame costs the same however long the run is. Running minima and maxima are updated from the rows
+    added since the last frame, and the axes are only rescaled, forcing a full draw, when a
+    value crosses the current limits. The velocity line is a plain finite difference of the
+    displacement readings, for monitoring only; processRun.py computes the smoothed velocity
+    that is saved. Call render() from the Tk thread only.
+    """
+
+    def __init__(self, canvas, ax_force_disp, ax_velocity_time, line_force_disp, line_velocity_time):
+        self.canvas = canvas
+        self.fig = canvas.figure
+        self.ax_force_disp = ax_force_disp
+        self.ax_velocity_time = ax_velocity_time
+        self.line_force_disp = line_force_disp
+        self.line_velocity_time = line_velocity_time
+        self.lines = (line_force_disp, line_velocity_time)
+        for line in self.lines:
+            line.set_animated(True)
+
+        self.background = None
+        self.canvas.mpl_connect("draw_event", self.on_draw)
+        self.rows_seen = 0
+        self.previous_reading = None  # (time_d, displacement) of the last row, carried into the next frame
+        self.minima = {}
+        self.maxima = {}
+        self.force_disp_points = MinMaxPyramid()
+        self.velocity_time_points = MinMaxPyramid()
+
+    def reset(self):
+        """Forget the previous run and restore the starting axis limits."""
+        self.rows_seen = 0
+        self.previous_reading = None
+        self.minima = {}
+        self.maxima = {}
+        self.force_disp_points.reset()
+        self.velocity_time_points.reset()
+        self.ax_force_disp.set_ylim(0, 2)
+        self.ax_force_disp.set_xlim(0, 1)
+        self.ax_velocity_time.set_ylim(0, 1)
+        self.ax_velocity_time.set_xlim(0, 30)
+        for line in self.lines:
+            line.set_data([], [])
+        self.canvas.draw_idle()
+
+    def on_draw(self, event):
+        # A full draw (resize, rescale) invalidates the cached background
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self.draw_lines()
+
+    def draw_lines(self):
+        for line in self.lines:
+            self.fig.draw_artist(line)
+
+    def add_new_rows(self, snapshot):
+        """Fold the rows added since the last frame into the decimations and running extremes."""
+        new_rows = snapshot.rows(self.rows_seen)
+        self.rows_seen = len(snapshot)
+        if len(new_rows) == 0:
+            return
+
+        columns = {name: new_rows[:, index] for index, name in enumerate(snapshot.columns)}
+        self.force_disp_points.extend(columns["displacement"], columns["force"])
+
+        # Velocity between successive displacement readings; a reading held over several rows
+        # (streaming mode) has the same time and is skipped
+        time_d, displacement = columns["time_d"], columns["displacement"]
+        if self.previous_reading is not None:
+            time_d = np.concatenate(([self.previous_reading[0]], time_d))
+            displacement = np.concatenate(([self.previous_reading[1]], displacement))
+        self.previous_reading = (time_d[-1], displacement[-1])
+        step = np.diff(time_d)
+        fresh = step > 0
+        if fresh.any():
+            columns["velocity"] = np.diff(displacement)[fresh] / step[fresh]
+            self.velocity_time_points.extend(time_d[1:][fresh], columns["velocity"])
+
+        for name, column in columns.items():
+            self.minima[name] = min(self.minima.get(name, np.inf), column.min())
+            self.maxima[name] = max(self.maxima.get(name, -np.inf), column.max())
+
+    def rescale(self):
+        """Grow the axes to fit the data seen so far. Returns True if any limit changed."""
+        changed = False
+        for set_limits, get_limits, name, floor, margin in (
+            (self.ax_force_disp.set_xlim, self.ax_force_disp.get_xlim, "displacement", 1, 1),
+            (self.ax_force_disp.set_ylim, self.ax_force_disp.get_ylim, "force", 2, 2),
+            (self.ax_velocity_time.set_xlim, self.ax_velocity_time.get_xlim, "time_d", 10, 2),
+            (self.ax_velocity_time.set_ylim, self.ax_velocity_time.get_ylim, "velocity", .25, 0),
+        ):
+            if name not in self.maxima:
+                continue
+            limits = grow_limits(get_limits(), min(0, self.minima[name]), max(floor, self.maxima[name]), margin)
+            if limits is not None:
+                set_limits(*limits)
+                changed = True
+        return changed
+
+    def render(self, snapshot):
+        if len(snapshot) < self.rows_seen:
+            self.reset()
+        self.add_new_rows(snapshot)
+
+        self.line_force_disp.set_data(*self.force_disp_points.points())
+        self.line_velocity_time.set_data(*self.velocity_time_points.points())
+
+        if self.rescale() or self.background is None:
+            # on_draw recaptures the background and draws the lines
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self.background)
+        self.draw_lines()
+        self.canvas.blit(self.fig.bbox)
@@ -3,9 +3,75 @@ import cv2
 import numpy as np
 import pandas as pd
 import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import filedialog
 from PIL import Image, ImageTk
 
+PREFETCH_COUNT = 3  # images after the current one decoded ahead of time
+CACHE_SIZE = 8  # decoded, display-scaled images kept, so earlier ones stay instant too
+
+def load_display_image(path, display_size):
+    """Decode an image and scale it to fit display_size. Returns (original (height, width), scaled PIL image, scale)."""
+    image = cv2.imread(path)
+    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    img = Image.fromarray(image)
+    img_ratio = img.width / img.height
+    win_width, win_height = display_size
+
+    if win_width / win_height > img_ratio:
+        new_height = win_height - 50
+        new_width = int(new_height * img_ratio)
+    else:
+        new_width = win_width - 50
+        new_height = int(new_width / img_ratio)
+
+    scaled = img.resize((new_width, new_height), Image.LANCZOS)
+    return image.shape[:2], scaled, scaled.width / img.width
+
+class ImageLoader:
+    """
+    Decodes and scales images on background threads, keeping the most recently used in an LRU cache.
+
+    cv2 and PIL release the GIL while decoding and resizing, so the Tk thread stays responsive.
+    Entries are keyed by path and display size, so a resized window loads afresh.
+    """
+    def __init__(self, cache_size=CACHE_SIZE, workers=2):
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # (path, display size) -> Future of load_display_image
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+
+    def get(self, path, display_size):
+        key = (path, display_size)
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+            else:
+                self.cache[key] = self.pool.submit(load_display_image, path, display_size)
+                while len(self.cache) > self.cache_size:
+                    _, evicted = self.cache.popitem(last=False)
+                    evicted.cancel()  # no-op if it already started
+            return self.cache[key]
+
+    def prefetch(self, paths, display_size):
+        # Nearest first, so the image needed next is the first one decoded
+        for path in paths:
+            self.get(path, display_size)
+        # Then mark the nearest as the most recently used, so it is the last to be evicted
+        with self.lock:
+            for path in reversed(paths):
+                key = (path, display_size)
+                if key in self.cache:
+                    self.cache.move_to_end(key)
+
+    def clear(self):
+        with self.lock:
+            for future in self.cache.values():
+                future.cancel()
+            self.cache.clear()
+
 class MicroneedleMeasurementApp:
     def __init__(self, root):
         self.root = root
@@ -47,6 +113,7 @@ class MicroneedleMeasurementApp:
         self.tk_image = None
         self.data = []
         self.original_image_size = None
+        self.loader = ImageLoader()
         
         self.canvas.bind("<Button-1>", self.capture_point)
         
@@ -61,42 +128,33 @@ class MicroneedleMeasurementApp:
         folder = filedialog.askdirectory()
         if folder:
             self.folder = folder
-            self.image_list = [os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(('png', 'jpg', 'jpeg', 'bmp'))]
+            self.image_list = [os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(('png', 'jpg', 'jpeg', 'bmp', 'tif', 'tiff'))]
             self.current_image_index = 0
+            self.loader.clear()
             self.load_next_image()
 
     def load_next_image(self):
         if self.current_image_index < len(self.image_list):
             self.image_path = self.image_list[self.current_image_index]
-            self.image = cv2.imread(self.image_path)
-            self.image = cv2.cvtColor(self.image, cv2.COLOR_BGR2RGB)
-            self.original_image_size = self.image.shape[:2]
             self.display_image()
             self.points = []
+            # Decode the next few while the points are being clicked
+            next_index = self.current_image_index + 1
+            self.loader.prefetch(self.image_list[next_index:next_index + PREFETCH_COUNT], self.display_size())
             print(self.current_image_index)
         else:
             self.save_to_excel()
             print("No more images.")
 
+    def display_size(self):
+        return self.root.winfo_width(), self.root.winfo_height()
+
     def display_image(self):
-        img = Image.fromarray(self.image)
-        img_ratio = img.width / img.height
-        win_width = self.root.winfo_width()
-        win_height = self.root.winfo_height()
-        
-        if win_width / win_height > img_ratio:
-            new_height = win_height - 50
-            new_width = int(new_height * img_ratio)
-        else:
-            new_width = win_width - 50
-            new_height = int(new_width / img_ratio)
-        
-        old_width = img.width
-        img = img.resize((new_width, new_height), Image.LANCZOS)
-        self.new_img_scale = img.width / old_width
+        # Normally already decoded and scaled by the loader; waits for it otherwise
+        self.original_image_size, self.image, self.new_img_scale = self.loader.get(self.image_path, self.display_size()).result()
         #print(self.new_img_scale)
-        self.tk_image = ImageTk.PhotoImage(img)
-        self.canvas.config(width=new_width, height=new_height)
+        self.tk_image = ImageTk.PhotoImage(self.image)
+        self.canvas.config(width=self.image.width, height=self.image.height)
         self.canvas.create_image(0, 0, anchor='nw', image=self.tk_image)
 
     def capture_point(self, event):
@@ -0,0 +1,200 @@
+# Drives several force/displacement test stands from one asyncio event loop
+# Example: python multiStand.py --stand A COM5 COM6 --stand B COM7 COM8 --rate 20 --output-dir runs
+import argparse
+import asyncio
+import os
+import time
+
+from acquisitionTelemetry import run_metadata_path, save_run_metadata
+from forceAcquisition import (BASELINE_MODES, DISPLACEMENT_POLL_COMMAND, FORCE_POLL_COMMAND, AcquisitionEngine,
+                              RawSample, open_connection)
+from sampleStore import SampleStore, SampleWriter
+
+
+class AsyncSensorPort:
+    """
+    Line-oriented request/response on a serial port without blocking the event loop.
+
+    The port is switched to timeout=0, so read() returns immediately with whatever has
+    arrived, and the coroutine yields to the other stands while waiting for the reply.
+    """
+
+    def __init__(self, connection, reply_timeout=0.2, poll_interval=0.001, telemetry=None, port=None):
+        self.connection = connection
+        self.connection.timeout = 0
+        self.reply_timeout = reply_timeout
+        self.poll_interval = poll_interval
+        self.telemetry = telemetry
+        self.port = port
+        self.buffer = b""
+
+    async def request(self, command):
+        """Send a poll command and return (request time, decoded reply line); "" on timeout."""
+        loop = asyncio.get_running_loop()
+        self.connection.write(command)
+        request_time = time.perf_counter()
+        deadline = loop.time() + self.reply_timeout
+        while True:
+            waiting = self.connection.in_waiting
+            if waiting:
+                self.buffer += self.connection.read(waiting)
+            end = self.buffer.find(b"\n")
+            if end >= 0:
+                line, self.buffer = self.buffer[:end], self.buffer[end + 1:]
+                if self.telemetry is not None:
+                    self.telemetry.record_reply(self.port, time.perf_counter() - request_time)
+                return request_time, line.decode('utf-8', errors='replace').strip()
+            if loop.time() >= deadline:
+                self.buffer = b""
+                if self.telemetry is not None:
+                    self.telemetry.record_reply(self.port, time.perf_counter() - request_time, timed_out=True)
+                return request_time, ""
+            await asyncio.sleep(self.poll_interval)
+
+
+class StandRunner:
+    """One test stand: its two ports, sample store, trigger state and run log."""
+
+    def __init__(self, name, force_port, displacement_port, baud_rate, readings_per_sec, start_force, output_path,
+                 pretrigger_readings_per_sec=None, pretrigger_seconds=1.0, baseline=BASELINE_MODES[0]):
+        self.name = name
+        self.readings_per_sec = readings_per_sec
+        self.output_path = output_path
+        self.force_connection = open_connection(force_port, baud_rate, timeout=0.2)
+        self.displacement_connection = open_connection(displacement_port, baud_rate, timeout=0.2)
+
+        self.store = SampleStore()
+        self.writer = SampleWriter(self.store, output_path)
+        # The engine's trigger and zeroing logic is reused; its reader threads are not
+        self.engine = AcquisitionEngine(self.force_connection, self.displacement_connection, self.store,
+                                        readings_per_sec, start_force,
+                                        pretrigger_readings_per_sec=pretrigger_readings_per_sec,
+                                        pretrigger_seconds=pretrigger_seconds, baseline=baseline)
+        telemetry = self.engine.telemetry
+        self.force_port = AsyncSensorPort(self.force_connection, telemetry=telemetry, port="force")
+        self.displacement_port = AsyncSensorPort(self.displacement_connection, telemetry=telemetry, port="displacement")
+        self.port_names = (force_port, displacement_port)
+        self.polls = 0
+        self.last_status = (time.perf_counter(), 0, 0)
+        self.error = None  # exception that stopped this stand early, if any
+
+    async def run(self):
+        # The engine's scheduler sets the poll deadlines and switches to the recording rate at the trigger
+        scheduler = self.engine.scheduler
+        self.writer.start()
+        try:
+            while True:
+                # Both poll commands go out together and the replies are awaited concurrently
+                (time_f, raw_force), (time_d, raw_displacement) = await asyncio.gather(
+                    self.force_port.request(FORCE_POLL_COMMAND),
+                    self.displacement_port.request(DISPLACEMENT_POLL_COMMAND))
+                self.engine.process_pair(RawSample(self.polls, time_f, raw_force),
+                                         RawSample(self.polls, time_d, raw_displacement))
+                self.polls += 1
+
+                wait = scheduler.delay()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+        finally:
+            self.close()
+
+    def close(self):
+        for connection in (self.force_connection, self.displacement_connection):
+            if connection.is_open:
+                connection.close()
+        if self.writer.is_alive():
+            self.writer.finish()
+            metadata = self.engine.run_metadata()
+            metadata.update(stand=self.name, force_port=self.port_names[0], displacement_port=self.port_names[1],
+                            data_file=os.path.basename(self.output_path))
+            save_run_metadata(run_metadata_path(self.output_path), metadata)
+
+    def status(self):
+        """One-line summary with the poll and sample rates since the previous call."""
+        now = time.perf_counter()
+        previous_time, previous_polls, previous_samples = self.last_status
+        elapsed = max(now - previous_time, 1e-9)
+        samples = len(self.store)
+        self.last_status = (now, self.polls, samples)
+        if self.error is not None:
+            state = "failed"
+        else:
+            state = "recording" if self.engine.triggered else "waiting"
+        return (f"{self.name}: {state} {samples} samples, "
+                f"{(self.polls - previous_polls) / elapsed:.1f} polls/s, "
+                f"{(samples - previous_samples) / elapsed:.1f} samples/s, "
+                f"{self.engine.scheduler.overruns} overruns, "
+                f"{sum(port.timeouts for port in self.engine.telemetry.ports.values())} timeouts, "
+                f"{sum(port.invalid for port in self.engine.telemetry.ports.values())} invalid")
+
+
+async def report_status(stands, interval=1.0):
+    while True:
+        await asyncio.sleep(interval)
+        print(" | ".join(stand.status() for stand in stands), flush=True)
+
+
+async def run_stand(stand):
+    """Run one stand; an error (e.g. an unplugged port) is logged and stops only this stand."""
+    try:
+        await stand.run()
+    except Exception as e:
+        stand.error = e
+        print(f"{stand.name}: stopped by error: {e!r}", flush=True)
+
+
+async def run_stands(stands, duration=None):
+    stand_tasks = [asyncio.create_task(run_stand(stand)) for stand in stands]
+    tasks = stand_tasks + [asyncio.create_task(report_status(stands))]
+    try:
+        # Runs until the duration is up or every stand has stopped
+        await asyncio.wait(stand_tasks, timeout=duration)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record several force/displacement stands from one process.")
+    parser.add_argument("--stand", nargs=3, action="append", required=True,
+                        metavar=("NAME", "FORCE_PORT", "DISPLACEMENT_PORT"), help="may be given several times")
+    parser.add_argument("--baud-rate", type=int, default=115200)
+    parser.add_argument("--rate", type=float, default=5, help="readings per second for every stand")
+    parser.add_argument("--pretrigger-rate", type=float, default=None,
+                        help="readings per second while waiting for the start force (default: --rate)")
+    parser.add_argument("--start-force", type=float, default=0.05, help="force (N) that starts recording")
+    parser.add_argument("--pretrigger-seconds", type=float, default=1.0,
+                        help="seconds of samples before the start force to keep (negative times)")
+    parser.add_argument("--baseline", choices=BASELINE_MODES, default=BASELINE_MODES[0],
+                        help="where displacement is zeroed: trigger sample, first or mean pre-trigger sample")
+    parser.add_argument("--duration", type=float, default=None, help="stop after this many seconds (default: Ctrl+C)")
+    parser.add_argument("--output-dir", default=".", help="folder for the per-stand CSV run logs")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    timestamp = time.strftime('%Y%m%d_%H%M%S')
+    stands = []
+    try:
+        for name, force_port, displacement_port in args.stand:
+            output_path = os.path.join(args.output_dir, f"{name}_run_{timestamp}.csv")
+            stands.append(StandRunner(name, force_port, displacement_port, args.baud_rate,
+                                      args.rate, args.start_force, output_path, args.pretrigger_rate,
+                                      args.pretrigger_seconds, args.baseline))
+        asyncio.run(run_stands(stands, args.duration))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for stand in stands:
+            stand.close()
+
+    for stand in stands:
+        print(f"{stand.name}: saved {stand.writer.rows_written} samples to {stand.output_path}")
+        if stand.error is not None:
+            print(f"{stand.name}: stopped early by error: {stand.error!r}")
+    if any(stand.error is not None for stand in stands):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# Post-processing of a recorded run: both channels on one uniform timebase, smoothed velocity and acceleration
+# Example: python processRun.py run_20240101_120000.csv --output run_20240101_120000.xlsx
+import argparse
+
+import numpy as np
+import pandas as pd
+from csaps import CubicSmoothingSpline
+from scipy.signal import savgol_filter
+
+from sampleStore import COLUMN_HEADERS
+
+DERIVATIVE_METHODS = ("spline", "savgol")
+
+PROCESSED_HEADERS = ("Time (s)", "Force (N)", "Displacement (mm)", "Velocity (mm/s)", "Acceleration (mm/s^2)")
+
+
+def _increasing(times, values):
+    """Drop repeated timestamps (a displacement reading held over several force samples in streaming mode)."""
+    order = np.argsort(times, kind="stable")
+    times, values = times[order], values[order]
+    keep = np.concatenate(([True], np.diff(times) > 0))
+    return times[keep], values[keep]
+
+
+def resample_run(time_f, force, time_d, displacement, rate=None):
+    """
+    Interpolate force and displacement onto one uniform time grid.
+
+    The grid covers the span where both channels have readings, at `rate` points per second
+    (default: the median force sample rate). Returns (time, force, displacement) arrays.
+    """
+    time_f, force = _increasing(np.asarray(time_f, dtype=float), np.asarray(force, dtype=float))
+    time_d, displacement = _increasing(np.asarray(time_d, dtype=float), np.asarray(displacement, dtype=float))
+    if len(time_f) < 2 or len(time_d) < 2:
+        raise ValueError("a run needs at least two readings of each channel to resample")
+
+    if rate is None:
+        rate = 1 / np.median(np.diff(time_f))
+    start = max(time_f[0], time_d[0])
+    stop = min(time_f[-1], time_d[-1])
+    time = start + np.arange(int(np.floor((stop - start) * rate)) + 1) / rate
+    if len(time) < 2:
+        raise ValueError(f"the channels overlap for {max(stop - start, 0):.3g} s, "
+                         f"too short for two points at {rate:g} per second")
+    return time, np.interp(time, time_f, force), np.interp(time, time_d, displacement)
+
+
+def derivatives(time, values, method=DERIVATIVE_METHODS[0], smoothing_time=0.25):
+    """
+    First and second time derivatives of uniformly sampled values.
+
+    "spline" fits a cubic smoothing spline (csaps) and differentiates it; "savgol" uses a cubic
+    Savitzky-Golay filter whose window (about 8 * smoothing_time long) is sized to cut off at the
+    same frequency as the spline. In both cases smoothing_time is roughly the time scale below
+    which wiggles are treated as noise, so the result does not depend on the sample rate or
+    the method. Returns (velocity, acceleration).
+    """
+    step = time[1] - time[0]
+    if len(time) < 5:
+        velocity = np.gradient(values, step)
+        return velocity, np.gradient(velocity, step)
+
+    if method == "savgol":
+        # The spline's cut-off is near 1 / (2 pi smoothing_time); a Savitzky-Golay filter of
+        # order n and window w cuts off near (n + 1) / (3.2 w - 4.6) cycles per sample (Schafer 2011)
+        order = 3
+        window = max(5, int(round(((order + 1) * 2 * np.pi * smoothing_time / step + 4.6) / 3.2)) | 1)
+        window = min(window, len(values) if len(values) % 2 else len(values) - 1)
+        velocity = savgol_filter(values, window, order, deriv=1, delta=step)
+        acceleration = savgol_filter(values, window, order, deriv=2, delta=step)
+        return velocity, acceleration
+
+    # With the data term summed over samples, a roughness weight of smoothing_time**4 / step
+    # puts the cut-off near smoothing_time whatever the rate
+    smooth = 1 / (1 + smoothing_time ** 4 / step)
+    spline = CubicSmoothingSpline(time, values, smooth=smooth).spline
+    return spline.derivative(1)(time), spline.derivative(2)(time)
+
+
+def process_run(raw, rate=None, method=DERIVATIVE_METHODS[0], smoothing_time=0.25):
+    """
+    Resample a run log (a DataFrame with the SampleWriter headers) and add velocity and acceleration.
+
+    Returns a DataFrame with PROCESSED_HEADERS, one row per grid point.
+    """
+    time, force, displacement = resample_run(raw[COLUMN_HEADERS["time_f"]].to_numpy(),
+                                             raw[COLUMN_HEADERS["force"]].to_numpy(),
+                                             raw[COLUMN_HEADERS["time_d"]].to_numpy(),
+                                             raw[COLUMN_HEADERS["displacement"]].to_numpy(), rate)
+    velocity, acceleration = derivatives(time, displacement, method, smoothing_time)
+    return pd.DataFrame(dict(zip(PROCESSED_HEADERS, (time, force, displacement, velocity, acceleration))))
+
+
+def write_run_workbook(raw, xlsx_path, **options):
+    """
+    Save a run as .xlsx: the processed table on the first sheet, which is what combineData.py
+    reads, and the samples as recorded on a "Raw" sheet.
+    """
+    with pd.ExcelWriter(xlsx_path, engine="openpyxl") as writer:
+        process_run(raw, **options).to_excel(writer, sheet_name="Processed", index=False)
+        raw.to_excel(writer, sheet_name="Raw", index=False)
+
+
+def export_run_log(csv_path, xlsx_path, **options):
+    """Convert a run log written by SampleWriter to the .xlsx layout used by save_data."""
+    write_run_workbook(pd.read_csv(csv_path), xlsx_path, **options)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resample a run log onto a uniform timebase and add velocity and acceleration.")
+    parser.add_argument("run_log", help="CSV run log written during acquisition")
+    parser.add_argument("--output", required=True, help=".xlsx (processed and raw sheets) or .csv (processed only)")
+    parser.add_argument("--rate", type=float, default=None, help="grid points per second (default: the force sample rate)")
+    parser.add_argument("--method", choices=DERIVATIVE_METHODS, default=DERIVATIVE_METHODS[0])
+    parser.add_argument("--smoothing-time", type=float, default=0.25,
+                        help="time scale (s) below which displacement changes are treated as noise")
+    args = parser.parse_args()
+
+    options = dict(rate=args.rate, method=args.method, smoothing_time=args.smoothing_time)
+    if args.output.lower().endswith(".csv"):
+        process_run(pd.read_csv(args.run_log), **options).to_csv(args.output, index=False)
+    else:
+        export_run_log(args.run_log, args.output, **options)
+    print(f"Saved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
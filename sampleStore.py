@@ -0,0 +1,208 @@
+# Columnar in-memory storage for force/displacement samples, and a writer that logs them to disk
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Column keys in the order they are written, and the headers used when a run is saved
+# Velocity is not recorded; processRun.py derives it from the whole run afterwards
+COLUMNS = ("time_f", "force", "time_d", "displacement", "delta_time")
+COLUMN_HEADERS = {
+    "time_f": "Force Time (s)",
+    "force": "Force (N)",
+    "time_d": "Displacement Time (s)",
+    "displacement": "Displacement (mm)",
+    "delta_time": "Delta Time (s)",
+}
+
+
+class SampleStore:
+    """
+    Append-only float64 columns stored in preallocated chunks.
+
+    One thread appends rows while any number of threads take snapshots. A row is written
+    into its chunk before the row count is published, so a snapshot never sees a partly
+    written row, and chunks are never resized, so views handed out stay valid.
+    """
+
+    def __init__(self, columns=COLUMNS, chunk_size=65536):
+        self.columns = tuple(columns)
+        self.chunk_size = chunk_size
+        # (chunks, count) is swapped as one object so readers always see a matching pair
+        self._state = ([], 0)
+
+    def __len__(self):
+        return self._state[1]
+
+    def append(self, *values):
+        """Write one row; values are given in column order."""
+        chunks, count = self._state
+        chunk_index, row = divmod(count, self.chunk_size)
+        if chunk_index == len(chunks):
+            chunks.append(np.empty((len(self.columns), self.chunk_size)))
+        chunks[chunk_index][:, row] = values
+        self._state = (chunks, count + 1)
+
+    def extend(self, *columns):
+        """Write a block of rows given as one array per column, in column order; scalars are repeated."""
+        block = np.array(np.broadcast_arrays(*columns), dtype=float)
+        chunks, count = self._state
+        written = 0
+        while written < block.shape[1]:
+            chunk_index, row = divmod(count + written, self.chunk_size)
+            if chunk_index == len(chunks):
+                chunks.append(np.empty((len(self.columns), self.chunk_size)))
+            take = min(block.shape[1] - written, self.chunk_size - row)
+            chunks[chunk_index][:, row:row + take] = block[:, written:written + take]
+            written += take
+        self._state = (chunks, count + written)
+
+    def clear(self):
+        """Start a new run. Snapshots taken earlier keep the old chunks alive."""
+        self._state = ([], 0)
+
+    def snapshot(self):
+        """Return a consistent read-only view of the rows written so far."""
+        chunks, count = self._state
+        return SampleSnapshot(self.columns, chunks[:], count, self.chunk_size)
+
+
+class SampleSnapshot:
+    """Rows of a SampleStore up to the moment the snapshot was taken."""
+
+    def __init__(self, columns, chunks, count, chunk_size):
+        self.columns = columns
+        self._chunks = chunks
+        self._count = count
+        self._chunk_size = chunk_size
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, name):
+        return self.column(name)
+
+    def column(self, name):
+        """
+        Return one column as a 1-D array.
+
+        This is a view into the store while the run fits in one chunk; longer runs are
+        joined into a new array.
+        """
+        index = self.columns.index(name)
+        full_chunks, rest = divmod(self._count, self._chunk_size)
+        parts = [chunk[index] for chunk in self._chunks[:full_chunks]]
+        if rest:
+            parts.append(self._chunks[full_chunks][index, :rest])
+
+        if not parts:
+            return np.empty(0)
+        if len(parts) == 1:
+            view = parts[0].view()
+            view.flags.writeable = False
+            return view
+        return np.concatenate(parts)
+
+    def rows(self, start, stop=None):
+        """Return rows start..stop as a 2-D array (rows x columns), touching only the chunks needed."""
+        stop = self._count if stop is None else min(stop, self._count)
+        if start >= stop:
+            return np.empty((0, len(self.columns)))
+        parts = []
+        row = start
+        while row < stop:
+            chunk_index, offset = divmod(row, self._chunk_size)
+            end = min(stop - row, self._chunk_size - offset) + offset
+            parts.append(self._chunks[chunk_index][:, offset:end].T)
+            row += end - offset
+        return parts[0].copy() if len(parts) == 1 else np.concatenate(parts)
+
+    def last(self, name):
+        """Return the most recent value of a column."""
+        index = self.columns.index(name)
+        chunk_index, row = divmod(self._count - 1, self._chunk_size)
+        return float(self._chunks[chunk_index][index, row])
+
+    def to_dataframe(self):
+        """Build a DataFrame with the same headers save_data has always written."""
+        return pd.DataFrame({COLUMN_HEADERS.get(name, name): self.column(name) for name in self.columns})
+
+
+class SampleRing:
+    """
+    Fixed-size ring of float64 rows that overwrites its oldest row when full.
+
+    The array is allocated once, so pushing a row never grows or allocates storage.
+    """
+
+    def __init__(self, capacity, width):
+        self.data = np.empty((max(1, capacity), width))
+        self.count = 0
+        self.next_row = 0
+
+    def __len__(self):
+        return self.count
+
+    def push(self, *values):
+        self.data[self.next_row] = values
+        self.next_row = (self.next_row + 1) % len(self.data)
+        self.count = min(self.count + 1, len(self.data))
+
+    def extend(self, rows):
+        """Push a block of rows (a 2-D array), oldest first."""
+        rows = rows[-len(self.data):]
+        first = min(len(rows), len(self.data) - self.next_row)
+        self.data[self.next_row:self.next_row + first] = rows[:first]
+        self.data[:len(rows) - first] = rows[first:]
+        self.next_row = (self.next_row + len(rows)) % len(self.data)
+        self.count = min(self.count + len(rows), len(self.data))
+
+    def ordered(self):
+        """Return the rows held, oldest first, as a new array."""
+        if self.count < len(self.data):
+            return self.data[:self.count].copy()
+        return np.concatenate((self.data[self.next_row:], self.data[:self.next_row]))
+
+    def clear(self):
+        self.count = 0
+        self.next_row = 0
+
+
+class SampleWriter(threading.Thread):
+    """
+    Append the rows of a SampleStore to a CSV file while a run is being recorded.
+
+    The writer wakes every flush_interval seconds, writes whatever rows arrived since the last
+    pass and flushes the file, so the acquisition loop never touches the disk and a crash loses
+    at most one interval of data.
+    """
+
+    def __init__(self, store, file_path, flush_interval=0.5):
+        super().__init__(name="sample-writer", daemon=True)
+        self.store = store
+        self.file_path = file_path
+        self.flush_interval = flush_interval
+        self.rows_written = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        with open(self.file_path, "w", newline="") as f:
+            f.write(",".join(COLUMN_HEADERS.get(name, name) for name in self.store.columns) + "\n")
+            while not self._stop_event.wait(self.flush_interval):
+                self._write_new_rows(f)
+            self._write_new_rows(f)
+
+    def _write_new_rows(self, f):
+        block = self.store.snapshot().rows(self.rows_written)
+        if len(block) == 0:
+            return
+        np.savetxt(f, block, delimiter=",", fmt="%.9g")
+        f.flush()
+        os.fsync(f.fileno())
+        self.rows_written += len(block)
+
+    def finish(self, timeout=None):
+        """Write any remaining rows and close the file."""
+        self._stop_event.set()
+        self.join(timeout)
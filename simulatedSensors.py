@@ -0,0 +1,214 @@
+# Simulated Mark-10 force gauge and displacement indicator for running the acquisition code without the test stand
+import random
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+import serial
+
+SIMULATED_PORT_PREFIX = "sim:"
+
+
+class SimulatedStand:
+    """
+    Shared motion model for a pair of simulated sensors.
+
+    The crosshead moves at `speed` mm/s from the moment the stand is created. Force stays near
+    zero until the needles touch the sample at `contact` mm, then rises with `stiffness` N/mm.
+    Gaussian noise with standard deviation `noise` is added to both readings.
+    """
+
+    def __init__(self, speed=0.05, contact=0.2, stiffness=4.0, noise=0.005, start_position=24.35):
+        self.speed = speed
+        self.contact = contact
+        self.stiffness = stiffness
+        self.noise = noise
+        self.start_position = start_position
+        self.start_time = time.perf_counter()
+        self.open_ports = 0
+
+    def travel(self, at=None):
+        at = time.perf_counter() if at is None else at
+        return self.speed * (at - self.start_time)
+
+    def force(self, at=None):
+        return self.stiffness * max(0.0, self.travel(at) - self.contact) + random.gauss(0, self.noise)
+
+    def displacement(self, at=None):
+        return self.start_position + self.travel(at) + random.gauss(0, self.noise)
+
+
+class SimulatedSensor:
+    """
+    In-process stand-in for a serial.Serial connection to one sensor.
+
+    write() with the poll command schedules one reply, which lands in the input buffer after
+    `latency` ± `jitter` seconds; a reply slower than the port timeout arrives too late for
+    that readline(), just as on a real port. `error_rate` is the fraction of replies that come
+    back garbled. When `stream_rate` is set the sensor also transmits continuously at that many
+    lines per second. read(), readline() and in_waiting behave like pyserial, including
+    timeout=0 for non-blocking reads.
+    """
+
+    def __init__(self, stand, command, format_reading, timeout=0.2, latency=0.005, jitter=0.001,
+                 error_rate=0.0, stream_rate=None):
+        self.stand = stand
+        self.command = command
+        self.format_reading = format_reading
+        self.timeout = timeout
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.stream_rate = stream_rate
+        self.is_open = True
+        self._pending = []  # times at which polled replies land in the buffer
+        self._buffer = b""
+        self._stream_sent = 0
+        self._stream_start = time.perf_counter()
+        self._lock = threading.Lock()
+        stand.open_ports += 1
+
+    def _check_open(self):
+        if not self.is_open:
+            raise serial.PortNotOpenError()
+
+    def _reply(self, at):
+        if self.error_rate and random.random() < self.error_rate:
+            return b"\x00?#\r\n"
+        return (self.format_reading(self.stand, at) + "\r\n").encode("utf-8")
+
+    def _fill(self):
+        """Move every reply that has arrived by now into the input buffer."""
+        now = time.perf_counter()
+        while self._pending and self._pending[0] <= now:
+            self._buffer += self._reply(self._pending.pop(0))
+        if self.stream_rate is not None:
+            due = int((now - self._stream_start) * self.stream_rate)
+            for n in range(self._stream_sent, due):
+                self._buffer += self._reply(self._stream_start + n / self.stream_rate)
+            self._stream_sent = max(self._stream_sent, due)
+
+    def _next_arrival(self):
+        candidates = []
+        if self._pending:
+            candidates.append(self._pending[0])
+        if self.stream_rate is not None:
+            candidates.append(self._stream_start + (self._stream_sent + 1) / self.stream_rate)
+        return min(candidates) if candidates else None
+
+    def _wait_for(self, ready, deadline):
+        """Return data taken by ready() from the buffer, waiting until deadline for it to arrive."""
+        while True:
+            with self._lock:
+                self._fill()
+                data = ready()
+                if data is not None:
+                    return data
+                next_arrival = self._next_arrival()
+            now = time.perf_counter()
+            if now >= deadline:
+                return None
+            wake = deadline if next_arrival is None else min(deadline, next_arrival)
+            time.sleep(max(0.0, wake - now))
+
+    def write(self, data):
+        self._check_open()
+        with self._lock:
+            if data == self.command:
+                delay = max(0.0, random.gauss(self.latency, self.jitter)) if self.jitter else self.latency
+                self._pending.append(time.perf_counter() + delay)
+                self._pending.sort()
+        return len(data)
+
+    def readline(self):
+        self._check_open()
+
+        def take_line():
+            end = self._buffer.find(b"\n")
+            if end < 0:
+                return None
+            line, self._buffer = self._buffer[:end + 1], self._buffer[end + 1:]
+            return line
+
+        line = self._wait_for(take_line, time.perf_counter() + (self.timeout or 0))
+        if line is None:
+            # Timed out: return whatever partial line there is, like pyserial
+            with self._lock:
+                line, self._buffer = self._buffer, b""
+        return line
+
+    @property
+    def in_waiting(self):
+        self._check_open()
+        with self._lock:
+            self._fill()
+            return len(self._buffer)
+
+    def read(self, size=1):
+        self._check_open()
+
+        def take_bytes():
+            if not self._buffer:
+                return None
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+            return data
+
+        data = self._wait_for(take_bytes, time.perf_counter() + (self.timeout or 0))
+        return b"" if data is None else data
+
+    def reset_input_buffer(self):
+        with self._lock:
+            self._fill()
+            self._buffer = b""
+
+    def close(self):
+        if self.is_open:
+            self.is_open = False
+            self.stand.open_ports -= 1
+
+
+def format_force(stand, at):
+    # Mark-10 reply, e.g. "1.23 N"
+    return f"{stand.force(at):.2f} N"
+
+
+def format_displacement(stand, at):
+    # Indicator reply, e.g. "01A+00024.35"
+    return f"01A{stand.displacement(at):+09.2f}"
+
+
+_stands = {}  # SimulatedStand per stand name, shared by its force and displacement ports
+
+
+def open_simulated_port(port, timeout=0.2):
+    """
+    Open a simulated sensor from a port name such as "sim:force?latency=0.01&jitter=0.002".
+
+    "sim:force" and "sim:displacement" opened while the other is still open share one
+    SimulatedStand, so their readings describe the same motion; add "stand=<name>" to the query
+    to simulate several independent stands. The other query parameters set the SimulatedSensor
+    options (latency, jitter, error_rate, stream_rate) and the stand options (speed, contact,
+    stiffness, noise) when a new stand is created.
+    """
+    url = urlparse(port[len(SIMULATED_PORT_PREFIX):])
+    query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+    stand_name = query.pop("stand", "")
+    try:
+        options = {key: float(value) for key, value in query.items()}
+    except ValueError as e:
+        raise serial.SerialException(f"Invalid option for simulated port {port}: {e}")
+    stand_options = {key: options.pop(key) for key in ("speed", "contact", "stiffness", "noise") if key in options}
+
+    stand = _stands.get(stand_name)
+    if stand is None or stand.open_ports == 0:
+        stand = _stands[stand_name] = SimulatedStand(**stand_options)
+
+    sensor = url.path.strip("/")
+    try:
+        if sensor == "force":
+            return SimulatedSensor(stand, bytes.fromhex("3f0d"), format_force, timeout=timeout, **options)
+        if sensor == "displacement":
+            return SimulatedSensor(stand, bytes.fromhex("310d"), format_displacement, timeout=timeout, **options)
+    except TypeError as e:
+        raise serial.SerialException(f"Invalid option for simulated port {port}: {e}")
+    raise serial.SerialException(f"Unknown simulated sensor {sensor!r} in {port}")
@@ -1,97 +1,163 @@
+import argparse
+import json
 import os
+import re
+from concurrent.futures import as_completed
 from PIL import Image
 
-def normalize_and_renumber_arrays(image_dir):
+from imageFormats import (IMAGE_EXTENSIONS, add_format_arguments, check_format_arguments, executor_for, output_name,
+                          save_image)
+
+# Renames applied by apply_renames, one JSON object per line, so they can be undone
+RENAME_JOURNAL = '.rename_journal.jsonl'
+
+
+def plan_renames(image_dir):
     """
-    Normalize filenames to collapse multiple underscores, group files by array (e.g., `_5_` and `_5a_`),
-    and renumber them sequentially within each group.
+    Work out the final name of every image in image_dir without touching the files.
+
+    Runs of underscores are collapsed, files are grouped by array (e.g., `_5_` and `_5a_` are
+    separate arrays) and renumbered 1, 2, ... in needle order within each group. Returns
+    {current name: final name} for the files whose name changes.
     """
     files_by_group = {}
+    final_names = {}
 
     # Normalize filenames to remove double underscores and collect files by group
-    for filename in os.listdir(image_dir):
-        if filename.endswith(".bmp"):
-            normalized_filename = filename.replace('__', '_')  # Remove double underscores
-            if normalized_filename != filename:
-                # Rename the file to its normalized name
-                original_path = os.path.join(image_dir, filename)
-                normalized_path = os.path.join(image_dir, normalized_filename)
-                os.rename(original_path, normalized_path)
-                print(f"Normalized: {filename} -> {normalized_filename}")
+    for filename in sorted(os.listdir(image_dir)):
+        if filename.lower().endswith(IMAGE_EXTENSIONS):
+            normalized_filename = re.sub('_+', '_', filename)
+            final_names[filename] = normalized_filename
 
             # Split the normalized filename
             parts = normalized_filename.split('_')
             if len(parts) >= 4:  # Ensure the filename has at least four parts
                 try:
-                    prefix = f"{parts[0]}_{parts[1]}"  # Combine the first two parts as a unique prefix
-                    array_key = parts[2]  # The third part is the array identifier (e.g., `_5_`, `_5a_`)
                     needle_number = int(parts[-1].split('.')[0])  # Extract the needle number (n)
-                    print(needle_number)
-                    group_key = f"{prefix}_{array_key}"  # Unique key combining prefix and array
-                    if group_key not in files_by_group:
-                        files_by_group[group_key] = []
-                    files_by_group[group_key].append((needle_number, normalized_filename))
                 except ValueError:
                     print(f"Skipping file with invalid needle number: {normalized_filename}")
+                    continue
+                group_key = '_'.join(parts[:3])  # First two parts as a prefix plus the array identifier
+                files_by_group.setdefault(group_key, []).append((needle_number, filename, parts))
 
-    # Renumber files within each group
+    # Renumber files within each group, sorted by needle number
     for group_key, files in files_by_group.items():
-        # Sort files by needle number within the group
         files.sort(key=lambda x: x[0])
+        for idx, (needle_number, filename, parts) in enumerate(files, start=1):
+            extension = os.path.splitext(parts[-1])[1]
+            final_names[filename] = '_'.join(parts[:-1] + [f"{idx}{extension}"])  # Sequential needle number
 
-        # First pass: Rename to temporary filenames to avoid conflicts
-        for idx, (original_number, filename) in enumerate(files, start=1):
-            temp_filename = f"temp_{group_key}_{idx}.bmp"  # Temporary name unique to each group
-            original_path = os.path.join(image_dir, filename)
-            temp_path = os.path.join(image_dir, temp_filename)
-            os.rename(original_path, temp_path)
+    # Two files ending up with one name would lose one of them
+    targets = {}
+    for filename, final_name in final_names.items():
+        if final_name in targets:
+            raise ValueError(f"{targets[final_name]} and {filename} would both be renamed to {final_name}")
+        targets[final_name] = filename
+    return {filename: final_name for filename, final_name in final_names.items() if final_name != filename}
 
-        # Second pass: Rename to final normalized filenames
-        for idx, (original_number, filename) in enumerate(files, start=1):
-            parts = filename.split('_')
-            parts[3] = f"{idx}.bmp"  # Update the needle number to be sequential
-            normalized_filename = '_'.join(parts)
-            temp_path = os.path.join(image_dir, f"temp_{group_key}_{idx}.bmp")
-            final_path = os.path.join(image_dir, normalized_filename)
-            os.rename(temp_path, final_path)
-            print(f"Renamed: {filename} -> {normalized_filename}")
-
-    # Renumber files within each group
-    for group_key, files in files_by_group.items():
-        # Sort files by prefix and needle number within the group
-        files.sort(key=lambda x: (int(group_key.split('_')[0]), int(group_key.split('_')[1]), x[0]))
-
-        # First pass: Rename to temporary filenames to avoid conflicts
-        for idx, (original_number, filename) in enumerate(files, start=1):
-            temp_filename = f"temp_{group_key}_{idx}.bmp"  # Temporary name unique to each group
-            original_path = os.path.join(image_dir, filename)
-            temp_path = os.path.join(image_dir, temp_filename)
-            os.rename(original_path, temp_path)
-
-        # Second pass: Rename to final normalized filenames
-        for idx, (original_number, filename) in enumerate(files, start=1):
-            parts = filename.split('_')
-            parts[3] = f"{idx}.bmp"  # Update the needle number to be sequential
-            normalized_filename = '_'.join(parts)
-            temp_path = os.path.join(image_dir, f"temp_{group_key}_{idx}.bmp")
-            final_path = os.path.join(image_dir, normalized_filename)
-            os.rename(temp_path, final_path)
-            print(f"Renamed: {filename} -> {normalized_filename}")
-
-def stitch_images(image_dir, output_dir, images_per_array=10):
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
 
+def order_renames(plan, existing):
+    """
+    Order a plan into rename steps that never overwrite a file.
+
+    A file is renamed once its target is free. Names that only swap among themselves form
+    cycles, and each cycle costs one extra rename through a temporary name. Returns a list of
+    (source, target) pairs.
+    """
+    for source, target in plan.items():
+        if target in existing and target not in plan:
+            raise ValueError(f"Cannot rename {source} to {target}: the name is taken by a file that stays")
+
+    pending = dict(plan)
+    waiting_for = {target: source for source, target in plan.items()}  # who needs each name freed
+    occupied = set(existing)
+    ready = [source for source, target in plan.items() if target not in occupied]
+    steps = []
+
+    def free(name):
+        occupied.discard(name)
+        if name in waiting_for:
+            ready.append(waiting_for.pop(name))
+
+    while pending:
+        if not ready:
+            # Only cycles are left: park one file of a cycle under a temporary name
+            source = next(iter(pending))
+            temporary = f"temp_rename_{len(steps)}_{source}"
+            steps.append((source, temporary))
+            occupied.add(temporary)
+            target = pending.pop(source)
+            pending[temporary] = target
+            waiting_for[target] = temporary
+            free(source)
+            continue
+        source = ready.pop()
+        target = pending.pop(source)
+        waiting_for.pop(target, None)
+        steps.append((source, target))
+        occupied.add(target)
+        free(source)
+    return steps
+
+
+def apply_renames(image_dir, steps, dry_run=False):
+    """Carry out rename steps, journaling each one so undo_renames can reverse them."""
+    if dry_run:
+        for source, target in steps:
+            print(f"Would rename: {source} -> {target}")
+        return
+    with open(os.path.join(image_dir, RENAME_JOURNAL), 'a') as journal:
+        for source, target in steps:
+            os.rename(os.path.join(image_dir, source), os.path.join(image_dir, target))
+            journal.write(json.dumps([source, target]) + '\n')
+            journal.flush()
+            print(f"Renamed: {source} -> {target}")
+
+
+def undo_renames(image_dir, dry_run=False):
+    """Reverse every rename in the journal, newest first, then remove the journal."""
+    journal_path = os.path.join(image_dir, RENAME_JOURNAL)
+    if not os.path.exists(journal_path):
+        print("Nothing to undo.")
+        return
+    with open(journal_path) as journal:
+        steps = [json.loads(line) for line in journal if line.strip()]
+    for source, target in reversed(steps):
+        if dry_run:
+            print(f"Would rename: {target} -> {source}")
+        else:
+            os.rename(os.path.join(image_dir, target), os.path.join(image_dir, source))
+            print(f"Renamed: {target} -> {source}")
+    if not dry_run:
+        os.remove(journal_path)
+
+
+def normalize_and_renumber_arrays(image_dir, dry_run=False):
+    """
+    Normalize filenames to collapse multiple underscores, group files by array (e.g., `_5_` and `_5a_`),
+    and renumber them sequentially within each group.
+
+    The directory is scanned once and every final name is planned before anything is renamed,
+    so each file is renamed at most once (plus one rename per cycle of swapped names).
+    """
+    plan = plan_renames(image_dir)
+    steps = order_renames(plan, set(os.listdir(image_dir)))
+    print(f"{len(plan)} files to rename in {len(steps)} steps")
+    apply_renames(image_dir, steps, dry_run)
+
+
+def group_filenames(filenames, images_per_array=10):
+    """Group image file names into arrays of images_per_array needles. Returns {group key: [(needle number, name)]}."""
     # Dictionary to hold lists of images by group (arrays of images_per_array images)
     images_by_group = {}
 
     # Iterate through all images in the directory
-    for filename in os.listdir(image_dir):
-        if filename.endswith(".bmp"):  # Ensure we are processing .bmp files
+    for filename in filenames:
+        if filename.lower().endswith(IMAGE_EXTENSIONS):  # Ensure we are processing image files
             parts = filename.split('_')
             if len(parts) >= 4:  # Ensure the filename has at least four parts
-                if int(parts[0]) != 1:
-                    try:
+                try:
+                    if int(parts[0]) != 1:
                         needle_number = int(parts[-1].split('.')[0])  # Extract the needle number (n)
                         # Identify which array the needle belongs to
                         array_number = (needle_number - 1) // images_per_array
@@ -99,41 +165,109 @@ def stitch_images(image_dir, output_dir, images_per_array=10):
                         if group_key not in images_by_group:
                             images_by_group[group_key] = []
                         images_by_group[group_key].append((needle_number, filename))
-                    except ValueError:
-                        print(f"Skipping file with invalid needle number: {filename}")
+                except ValueError:
+                    print(f"Skipping file with invalid needle number: {filename}")
 
-    # Stitch images together by group
-    new_key = 0
-    for group_key, files in images_by_group.items():
-        # Sort files to ensure correct order within the group
+    # Sort files to ensure correct order within the group
+    for files in images_by_group.values():
         files.sort(key=lambda x: x[0])  # Sort by needle number
+    return images_by_group
+
+
+def group_images(image_dir, images_per_array=10):
+    """Group the images of image_dir into arrays of images_per_array needles, sorted by needle number."""
+    return group_filenames(os.listdir(image_dir), images_per_array)
+
+
+def stitch_group(image_dir, output_dir, group_key, files, output_format="bmp", level=None):
+    """
+    Stitch one array's images side by side, each rotated 90 degrees, and save the strip.
+
+    The canvas size comes from the image headers, and each image is decoded, rotated and
+    pasted on its own, so only the canvas and one image are in memory at a time.
+    """
+    paths = [os.path.join(image_dir, f[1]) for f in files]
 
-        # Open all images
-        images = [Image.open(os.path.join(image_dir, f[1])).rotate(90, expand=True) for f in files]
+    # Opening an image only reads its header; rotating by 90 degrees swaps width and height
+    sizes = []
+    for path in paths:
+        with Image.open(path) as img:
+            sizes.append(img.size)
+    total_width = sum(height for width, height in sizes)
+    max_height = max(width for width, height in sizes)
+
+    # Create a new blank image with the total width and max height
+    new_image = Image.new('RGB', (total_width, max_height))
+
+    # Paste each image side by side
+    x_offset = 0
+    for path in paths:
+        with Image.open(path) as img:
+            rotated = img.rotate(90, expand=True)
+        new_image.paste(rotated, (x_offset, 0))
+        x_offset += rotated.width
+
+    # Save the combined image
+    output_filename = output_name(f"{group_key}_combined_before", output_format)
+    output_path = os.path.join(output_dir, output_filename)
+    save_image(new_image, output_path, output_format, level)
+    return output_path
+
+
+def stitch_images(image_dir, output_dir, images_per_array=10, workers=None, output_format="bmp", level=None):
+    """
+    Stitch every array in image_dir into one strip per array, saved in output_format.
+
+    Arrays are independent, so they are spread over a pool of `workers` (default: up to 4),
+    threads for PNG output and processes otherwise. Each worker holds one strip and one
+    source image, so peak memory grows with the number of workers, not with the number of
+    images.
+    """
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    images_by_group = group_images(image_dir, images_per_array)
+    if workers is None:
+        workers = min(4, os.cpu_count() or 1)
+
+    # Stitch images together by group
+    if workers == 1 or len(images_by_group) < 2:
+        for group_key, files in images_by_group.items():
+            output_path = stitch_group(image_dir, output_dir, group_key, files, output_format, level)
+            print(f"Saved combined image: {output_path}")
+        return
 
-        # Calculate total width and max height for the output image
-        total_width = sum(img.width for img in images)
-        max_height = max(img.height for img in images)
+    with executor_for(output_format, workers) as pool:
+        futures = [pool.submit(stitch_group, image_dir, output_dir, group_key, files, output_format, level)
+                   for group_key, files in images_by_group.items()]
+        for future in as_completed(futures):
+            print(f"Saved combined image: {future.result()}")
 
-        # Create a new blank image with the total width and max height
-        new_image = Image.new('RGB', (total_width, max_height))
 
-        # Paste each image side by side
-        x_offset = 0
-        for img in images:
-            new_image.paste(img, (x_offset, 0))
-            x_offset += img.width
+def main():
+    parser = argparse.ArgumentParser(description="Stitch the needle images of each array into one strip.")
+    # Directory containing your cropped images
+    parser.add_argument("image_dir", nargs="?", default='C:\\Users\\cneje\\Downloads\\20um_tip_bm\\20um_tip_bm')
+    # Directory to save the combined images
+    parser.add_argument("output_dir", nargs="?", default='C:\\Users\\cneje\\Downloads\\2025-06-30_BM-MNAs_IMG\\combined')
+    parser.add_argument("--images-per-array", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=None, help="arrays stitched in parallel (default: up to 4)")
+    add_format_arguments(parser, "the strips")
+    parser.add_argument("--renumber", action="store_true", help="normalize and renumber the file names before stitching")
+    parser.add_argument("--undo-renumber", action="store_true", help="restore the names changed by --renumber and stop")
+    parser.add_argument("--dry-run", action="store_true", help="only print the renames --renumber or --undo-renumber would do")
+    args = parser.parse_args()
+    check_format_arguments(parser, args)
 
-        # Save the combined image
-        output_filename = f"{group_key}_combined_before.bmp"
-        output_path = os.path.join(output_dir, output_filename)
-        new_image.save(output_path)
-        print(f"Saved combined image: {output_path}")
-        new_key += 1
+    if args.undo_renumber:
+        undo_renames(args.image_dir, args.dry_run)
+        return
+    if args.renumber:
+        normalize_and_renumber_arrays(args.image_dir, args.dry_run)
+        if args.dry_run:
+            return
+    stitch_images(args.image_dir, args.output_dir, args.images_per_array, args.workers, args.output_format, args.level)
 
-# Define your input and output directories
-image_dir = 'C:\\Users\\cneje\\Downloads\\20um_tip_bm\\20um_tip_bm'  # Directory containing your cropped images
-output_dir = 'C:\\Users\\cneje\\Downloads\\2025-06-30_BM-MNAs_IMG\\combined'  # Directory to save the combined images
 
-#normalize_and_renumber_files(image_dir)
-stitch_images(image_dir, output_dir)
+if __name__ == "__main__":
+    main()